@@ -0,0 +1,86 @@
+"""
+Error-path regression check for the bulk decryption CLI.
+
+A wrong key or a corrupt file must fail with its own ValueError and leave the
+memory-mapped input closed, and two inputs that would be written to the same
+output must be refused before anything is written.
+
+Usage: python benchmarks/bulk_decrypt_check.py
+"""
+import os
+import sys
+import tempfile
+
+REPO_ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, REPO_ROOT)
+
+def open_fds_for(path):
+    """Return the number of this process's file descriptors open on path (Linux only, else 0)."""
+    if not os.path.isdir('/proc/self/fd'):
+        return 0
+    count = 0
+    for fd in os.listdir('/proc/self/fd'):
+        try:
+            count += os.readlink(os.path.join('/proc/self/fd', fd)) == os.path.realpath(path)
+        except OSError:
+            pass
+    return count
+
+def bad_padding_ciphertext(password):
+    """Return a ciphertext that decrypts under password to a block with invalid padding."""
+    from Crypto.Cipher import AES
+    from shared.crypto_utils import derive_key
+
+    iv = bytes(AES.block_size)
+    return iv + AES.new(derive_key(password), AES.MODE_CBC, iv=iv).encrypt(bytes(AES.block_size))
+
+def check_decrypt_errors(workdir):
+    from server.decryption.bulk_decrypt import decrypt_file
+
+    failures = []
+    cases = {
+        'bad padding': (bad_padding_ciphertext('password'), "Padding is incorrect."),
+        'truncated': (b'x' * 20, "not a positive multiple of the block size"),
+    }
+    for name, (ciphertext, expected) in cases.items():
+        path = os.path.join(workdir, name.replace(' ', '_') + '.enc')
+        with open(path, 'wb') as f:
+            f.write(ciphertext)
+        try:
+            decrypt_file(path, 'password')
+            failures.append(f"{name}: decrypt_file did not raise")
+        except ValueError as e:
+            if expected not in str(e):
+                failures.append(f"{name}: unexpected error {e!r}")
+        except Exception as e:
+            failures.append(f"{name}: expected ValueError, got {type(e).__name__}: {e}")
+        if open_fds_for(path):
+            failures.append(f"{name}: input file still open after the error")
+    return failures
+
+def check_colliding_outputs(workdir):
+    from client.encryption.aes_encryption import aes_encrypt
+    from server.decryption.bulk_decrypt import bulk_decrypt
+
+    roots = [os.path.join(workdir, 'archive_a'), os.path.join(workdir, 'archive_b')]
+    for root in roots:
+        os.makedirs(root)
+        with open(os.path.join(root, 'f.enc'), 'wb') as f:
+            f.write(aes_encrypt(b'payload', 'password'))
+    output_dir = os.path.join(workdir, 'out')
+    try:
+        bulk_decrypt(roots, output_dir, 'password', workers=1)
+    except ValueError:
+        return [] if not os.path.exists(output_dir) else ["colliding inputs: outputs were written"]
+    return ["colliding inputs: bulk_decrypt did not raise"]
+
+def main():
+    with tempfile.TemporaryDirectory() as workdir:
+        failures = check_decrypt_errors(workdir) + check_colliding_outputs(workdir)
+    for failure in failures:
+        print(f"FAIL {failure}")
+    print(f"{len(failures)} failure(s)" if failures else "ok")
+    return 1 if failures else 0
+
+if __name__ == "__main__":
+    sys.exit(main())
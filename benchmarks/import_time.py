@@ -0,0 +1,94 @@
+"""
+Import-time regression check for the entry points.
+
+Each module is imported in a fresh interpreter with `-X importtime`; the best
+cumulative import time over several runs is compared with its budget, and
+the check fails if an entry point pulls in one of the heavy dependencies that
+must only be loaded on first use, or if importing it creates files: work such
+as opening the server's storage belongs in main(), where its cost depends on
+the data rather than on the code.
+
+Usage: python benchmarks/import_time.py [--repeat N] [--budget MODULE=MS ...]
+"""
+import os
+import sys
+import argparse
+import tempfile
+import subprocess
+
+REPO_ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+
+# Budgets in milliseconds for the cumulative import time of each entry point
+BUDGETS_MS = {
+    'cli': 50,
+    'client.client': 150,
+    'server.server': 150,
+    'server.decryption.bulk_decrypt': 150,
+    'reconstruction_audit': 150,
+}
+
+# Dependencies that must not be imported at startup
+HEAVY_MODULES = ['numpy', 'skimage', 'pywt', 'cv2', 'kyber_py', 'PIL', 'scipy']
+
+def measure_import(module):
+    """
+    Import a module in a fresh interpreter.
+
+    Returns:
+        tuple: (cumulative import time in ms, set of top-level packages imported,
+            names created in the working directory)
+    """
+    # Run from an empty directory, so whatever the import creates can be seen
+    with tempfile.TemporaryDirectory() as cwd:
+        env = dict(os.environ, PYTHONPATH=REPO_ROOT)
+        result = subprocess.run([sys.executable, '-X', 'importtime', '-c', f'import {module}'],
+                                cwd=cwd, env=env, capture_output=True, text=True)
+        created = sorted(os.listdir(cwd))
+    if result.returncode != 0:
+        raise RuntimeError(f"Importing {module} failed:\n{result.stderr}")
+
+    cumulative_us = None
+    packages = set()
+    for line in result.stderr.splitlines():
+        if not line.startswith('import time:') or 'cumulative' in line:
+            continue
+        _, cumulative, name = line[len('import time:'):].split('|')
+        name = name.strip()
+        packages.add(name.split('.')[0])
+        if name == module:
+            cumulative_us = int(cumulative)
+    if cumulative_us is None:
+        raise RuntimeError(f"No import time reported for {module}")
+    return cumulative_us / 1000, packages, created
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Check entry-point import times against budgets.")
+    parser.add_argument('--repeat', type=int, default=5, help="Runs per module; the fastest counts")
+    parser.add_argument('--budget', action='append', default=[], metavar='MODULE=MS',
+                        help="Override or add a budget in milliseconds")
+    args = parser.parse_args(argv)
+
+    budgets = dict(BUDGETS_MS)
+    for item in args.budget:
+        module, ms = item.split('=')
+        budgets[module] = float(ms)
+
+    failures = 0
+    for module, budget in budgets.items():
+        best_ms, packages, created = min(measure_import(module) for _ in range(args.repeat))
+        heavy = sorted(set(HEAVY_MODULES) & packages)
+        status = 'ok'
+        if best_ms > budget:
+            status = 'OVER BUDGET'
+        if heavy:
+            status = f"imports {', '.join(heavy)}"
+        if created:
+            status = f"creates {', '.join(created)} on import"
+        if status != 'ok':
+            failures += 1
+        print(f"{module:<35} {best_ms:8.1f} ms  (budget {budget:g} ms)  {status}")
+
+    return 1 if failures else 0
+
+if __name__ == "__main__":
+    sys.exit(main())
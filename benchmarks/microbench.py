@@ -0,0 +1,322 @@
+"""
+Component microbenchmarks with stored baselines.
+
+Every benchmark runs on fixed synthetic inputs (seeded NumPy RNG, images
+written to a temporary directory), so results are comparable across runs and
+need no network or sample data. The best per-call time over several repeats
+is divided by the time of a fixed calibration loop run just before it, so that
+baselines recorded on one machine remain usable on another. These relative
+times are compared with benchmarks/baselines.json and the run fails if any
+benchmark is slower than its baseline times the regression threshold. A
+benchmark's inputs are only built if it passes the -k filter.
+
+Usage:
+    python benchmarks/microbench.py                    # compare against the baselines
+    python benchmarks/microbench.py --save-baseline    # record new baselines on this machine
+    python benchmarks/microbench.py -k aes --threshold 1.2
+"""
+import os
+import sys
+import json
+import time
+import zlib
+import pickle
+import hashlib
+import platform
+import argparse
+import tempfile
+
+REPO_ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, REPO_ROOT)
+
+BASELINE_PATH = os.path.join(REPO_ROOT, 'benchmarks', 'baselines.json')
+DEFAULT_THRESHOLD = 1.5  # Fail when a benchmark is 50% slower than its baseline
+PAYLOAD_SIZES = [1024, 64 * 1024, 1024 * 1024, 8 * 1024 * 1024]
+IMAGE_SIZES = [64, 256, 1024]
+SEED = 1234
+PASSWORD = "benchmark_password"
+
+def size_label(size):
+    if size >= 1024 * 1024:
+        return f"{size // (1024 * 1024)}MB"
+    return f"{size // 1024}KB"
+
+def time_call(func, repeat=5, min_time=0.1):
+    """
+    Return the best time per call of func in seconds.
+
+    After a warm-up call, the number of calls per repeat is calibrated so
+    that one repeat takes at least min_time seconds; the minimum over the repeats is reported because
+    it is the least affected by other load on the machine.
+    """
+    func()  # Warm up: first calls may load modules or take a different path
+    number = 1
+    while True:
+        start = time.perf_counter()
+        for _ in range(number):
+            func()
+        elapsed = time.perf_counter() - start
+        if elapsed >= min_time or number >= 1 << 20:
+            break
+        number *= 10 if elapsed == 0 else min(10, max(2, int(min_time / elapsed) + 1))
+
+    best = elapsed / number
+    for _ in range(repeat - 1):
+        start = time.perf_counter()
+        for _ in range(number):
+            func()
+        best = min(best, (time.perf_counter() - start) / number)
+    return best
+
+def synthetic_image(rng, size):
+    """Return a deterministic size x size RGB image with smooth structure and noise."""
+    import numpy as np
+
+    y, x = np.mgrid[0:size, 0:size] / size
+    base = (np.sin(6 * x) + np.cos(4 * y)) * 60 + 128
+    channels = [base + rng.normal(0, 10, (size, size)) for _ in range(3)]
+    return np.clip(np.stack(channels, axis=-1), 0, 255).astype(np.uint8)
+
+def crypto_benchmarks():
+    def aes(size, decrypt):
+        def setup(rng):
+            from client.encryption.aes_encryption import aes_encrypt
+            from server.decryption.aes_decryption import aes_decrypt
+
+            payload = rng.integers(0, 256, size, dtype='uint8').tobytes()
+            if not decrypt:
+                return lambda: aes_encrypt(payload, PASSWORD)
+            ciphertext = aes_encrypt(payload, PASSWORD)
+            return lambda: aes_decrypt(ciphertext, PASSWORD)
+        return setup
+
+    for size in PAYLOAD_SIZES:
+        yield f"aes_encrypt[{size_label(size)}]", aes(size, decrypt=False)
+        yield f"aes_decrypt[{size_label(size)}]", aes(size, decrypt=True)
+
+    def derive_keys(rng):
+        from shared.crypto_utils import derive_key
+
+        # A single derivation takes well under a microsecond, too little to time reliably
+        passwords = [f"{PASSWORD}-{i}" for i in range(1000)]
+        def call():
+            for password in passwords:
+                derive_key.__wrapped__(password)
+        return call
+    yield "derive_key[1000 passwords]", derive_keys
+
+    def xor(in_place):
+        def setup(rng):
+            from shared.crypto_utils import xor_data
+
+            data1 = rng.integers(0, 256, 1024 * 1024, dtype='uint8').tobytes()
+            data2 = rng.integers(0, 256, 1024 * 1024, dtype='uint8').tobytes()
+            if not in_place:
+                return lambda: xor_data(data1, data2)
+            out = bytearray(len(data1))
+            return lambda: xor_data(data1, data2, out=out)
+        return setup
+    yield "xor_data[1MB]", xor(in_place=False)
+    yield "xor_data[1MB,out]", xor(in_place=True)
+
+def image_benchmarks(workdir):
+    def compare(size):
+        def setup(rng):
+            from ID_MSE import compare_images
+
+            image1 = synthetic_image(rng, size)
+            image2 = synthetic_image(rng, size)
+            return lambda: compare_images(image1, image2)
+        return setup
+
+    def image_file(rng, size, name):
+        from skimage import io
+
+        path = os.path.join(workdir, f"{name}_{size}.png")
+        io.imsave(path, synthetic_image(rng, size), check_contrast=False)
+        return path
+
+    def dwt(size, stage):
+        def setup(rng):
+            from client.encryption.dwt_processor import DWTProcessor
+            from server.decryption.dwt_reconstructor import DWTReconstructor
+
+            processor = DWTProcessor(image_file(rng, size, 'dwt'))
+            if stage == 'decompose':
+                return processor.decompose
+            ll2, details2, details1 = processor.decompose()
+            fragments = {'ll2': ll2, 'lh2_hl2_hh2': details2, 'lh_hl_hh': details1, 'meta': processor.metadata()}
+            reconstructor = DWTReconstructor()
+            return lambda: reconstructor.reconstruct_image(fragments, None)
+        return setup
+
+    def progressive(size, stage):
+        def setup(rng):
+            from client.encryption.dwt_processor import progressive_stages
+            from server.decryption.dwt_reconstructor import preview_image
+
+            path = image_file(rng, size, 'progressive')
+            if stage == 'stages':
+                return lambda: progressive_stages(path)
+            coarse, details, _ = progressive_stages(path)
+            fragments = {**coarse, **details}
+            return lambda: preview_image(fragments)
+        return setup
+
+    for size in IMAGE_SIZES:
+        yield f"compare_images[{size}px]", compare(size)
+        yield f"DWTProcessor.decompose[{size}px]", dwt(size, 'decompose')
+        yield f"DWTReconstructor.reconstruct_image[{size}px]", dwt(size, 'reconstruct')
+        yield f"progressive_stages[{size}px]", progressive(size, 'stages')
+        yield f"preview_image[{size}px]", progressive(size, 'preview')
+
+def key_rotation_benchmarks(workdir):
+    def alternate(use_perceptual_hash):
+        def setup(rng):
+            from skimage import io
+            from shared.key_rotation_manager import KeyRotationManager
+
+            # Two unrelated scenes: alternating between them forces a decision every call
+            paths = []
+            for name in ('scene_a', 'scene_b'):
+                path = os.path.join(workdir, f"{name}.png")
+                image = synthetic_image(rng, 256)
+                io.imsave(path, image if name == 'scene_a' else 255 - image, check_contrast=False)
+                paths.append(path)
+
+            manager = KeyRotationManager(use_perceptual_hash=use_perceptual_hash)
+            state = {'index': 0}
+            def call():
+                state['index'] ^= 1
+                return manager.should_rotate_key(paths[state['index']])
+            return call
+        return setup
+
+    yield "should_rotate_key[phash]", alternate(True)
+    # The MSE path rotates on every alternation, so this includes ML-KEM keygen and encaps
+    yield "should_rotate_key[mse+mlkem]", alternate(False)
+
+    def generate_password(rng):
+        from shared.key_rotation_manager import KeyRotationManager
+        return KeyRotationManager()._generate_password
+    yield "ML_KEM_1024.keygen+encaps", generate_password
+
+def pickle_benchmarks():
+    def roundtrip(make_payload):
+        def setup(rng):
+            payload = make_payload(rng)
+            return lambda: pickle.loads(pickle.dumps(payload))
+        return setup
+
+    for size in PAYLOAD_SIZES[1:]:  # A 1KB round trip takes under a microsecond, too little to time reliably
+        yield f"pickle_roundtrip[bytes,{size_label(size)}]", \
+            roundtrip(lambda rng, size=size: rng.integers(0, 256, size, dtype='uint8').tobytes())
+    yield "pickle_roundtrip[ndarray,512px]", roundtrip(lambda rng: rng.random((512, 512)))
+
+def collect_benchmarks(workdir):
+    """
+    Yield (name, setup) for every benchmark.
+
+    setup(rng) builds the benchmark's inputs and returns the callable to time.
+    Nothing is imported or built until setup is called, so benchmarks that
+    are filtered out cost nothing, and a benchmark whose dependencies are
+    missing raises ImportError from its setup.
+    """
+    yield from crypto_benchmarks()
+    yield from image_benchmarks(workdir)
+    yield from key_rotation_benchmarks(workdir)
+    yield from pickle_benchmarks()
+
+def benchmark_rng(name):
+    """Return an RNG seeded from SEED and the benchmark name, so inputs do not depend on which benchmarks run."""
+    import numpy as np
+    return np.random.default_rng([SEED, zlib.crc32(name.encode())])
+
+def calibration_loop():
+    """
+    Fixed reference workload timed before every benchmark.
+
+    Benchmarks are compared as multiples of its time, which cancels most of
+    the speed difference between the machine that recorded the baselines and
+    the one running the check. It mixes interpreter, NumPy and hashing work
+    like the benchmarks do.
+    """
+    import numpy as np
+
+    total = 0
+    for i in range(20000):
+        total += i * i % 7
+    values = np.arange(100000, dtype=np.float64)
+    total += int(np.sqrt(values).sum())
+    return total + len(hashlib.sha256(bytes(256 * 1024)).digest())
+
+def load_baselines(path):
+    if not os.path.exists(path):
+        return {}
+    with open(path, 'r') as f:
+        return json.load(f)
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Run component microbenchmarks and check for regressions.")
+    parser.add_argument('-k', '--filter', default='', help="Only run benchmarks whose name contains this string")
+    parser.add_argument('--baseline', default=BASELINE_PATH, help="Baseline file")
+    parser.add_argument('--save-baseline', action='store_true', help="Store the results as the new baselines")
+    parser.add_argument('--threshold', type=float, default=None,
+                        help="Allowed slowdown factor (default: from the baseline file, else %g)" % DEFAULT_THRESHOLD)
+    parser.add_argument('--repeat', type=int, default=5, help="Repeats per benchmark; the fastest counts")
+    args = parser.parse_args(argv)
+
+    baselines = load_baselines(args.baseline)
+    threshold = args.threshold or baselines.get('threshold', DEFAULT_THRESHOLD)
+    known = baselines.get('benchmarks', {})
+
+    results = {}
+    regressions = []
+    units = []
+    with tempfile.TemporaryDirectory() as workdir:
+        for name, setup in collect_benchmarks(workdir):
+            if args.filter not in name:
+                continue
+            try:
+                func = setup(benchmark_rng(name))
+                # Calibrate next to every benchmark, so both see the same load on the machine
+                unit = time_call(calibration_loop, repeat=2)
+                seconds = time_call(func, repeat=args.repeat)
+            except ImportError as e:  # Some dependencies are only imported on first use
+                print(f"Skipping {name}: {e}")
+                continue
+            units.append(unit)
+            results[name] = {'seconds': seconds, 'relative': seconds / unit}
+
+            baseline = known.get(name)
+            if baseline is None or 'relative' not in baseline:
+                status = 'no baseline'
+            else:
+                limit = baseline.get('threshold', threshold)
+                ratio = results[name]['relative'] / baseline['relative']
+                status = f"{ratio:5.2f}x"
+                if ratio > limit:
+                    status += f"  REGRESSION (> {limit:g}x)"
+                    regressions.append(name)
+            print(f"{name:<45} {seconds * 1e6:12.1f} us  {status}")
+
+    if args.save_baseline:
+        for name, result in results.items():
+            known.setdefault(name, {}).update(result)
+        baselines['benchmarks'] = dict(sorted(known.items()))
+        baselines['calibration'] = {'seconds': min(units, default=None), 'machine': f"{platform.machine()} {platform.python_implementation()} "
+                                                                f"{platform.python_version()}"}
+        baselines.setdefault('threshold', DEFAULT_THRESHOLD)
+        with open(args.baseline, 'w') as f:
+            json.dump(baselines, f, indent=2)
+            f.write('\n')
+        print(f"Saved {len(results)} baseline(s) to {args.baseline}")
+        return 0
+
+    if regressions:
+        print(f"{len(regressions)} benchmark(s) regressed: {', '.join(regressions)}")
+        return 1
+    return 0
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,31 @@
+"""
+Lightweight command-line entry point.
+
+Usage: python cli.py {client,server,bulk-decrypt,audit} [args...]
+
+Only the module of the chosen command is imported, so every command starts
+without paying for the dependencies of the others.
+"""
+import sys
+import argparse
+import importlib
+
+COMMANDS = {
+    'client': 'client.client',
+    'server': 'server.server',
+    'bulk-decrypt': 'server.decryption.bulk_decrypt',
+    'audit': 'reconstruction_audit',
+}
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Secure image transfer with DWT and key rotation.")
+    parser.add_argument('command', choices=COMMANDS, help="Command to run")
+    parser.add_argument('args', nargs=argparse.REMAINDER, help="Arguments passed to the command")
+    args = parser.parse_args(argv)
+
+    module = importlib.import_module(COMMANDS[args.command])
+    sys.argv = [f"{parser.prog} {args.command}"] + args.args
+    return module.main()
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -1,21 +1,28 @@
 import socket
 import os
+import zlib
 import struct
 import pickle
 import hashlib
 import logging
 import time  # Import time for timeout handling
+from concurrent.futures import ThreadPoolExecutor
 from client.encryption.aes_encryption import aes_encrypt
-from client.encryption.dwt_processor import process_image
-from shared.crypto_utils import derive_key, sha256_hash, sha512_hash
 from shared.key_rotation_manager import KeyRotationManager
 from client.utils.file_utils import read_image
+from client.utils.scheduler import load_schedule_manifest, schedule_files, split_stripes
 
 SERVER_ADDRESS = ('192.168.233.129', 12345)
 
 sent_directory = "sent"
 key_rotation_manager = KeyRotationManager()
 password = "secure_password"
+PROGRESSIVE_TRANSFER = False  # Send DWT bands coarse to fine instead of the raw file
+SCHEDULING_POLICY = 'sjf'  # One of 'name', 'sjf', 'priority', 'deadline'
+STRIPE_THRESHOLD = 64 * 1024 * 1024  # Files at least this large are striped across connections
+STRIPE_CONNECTIONS = 4
+STRIPE_CHUNK_SIZE = 8 * 1024 * 1024
+PIPELINE_DEPTH = 32  # Files sent before waiting for their ACKs; the server commits them together
 
 client_socket = socket.socket(socket.AF_INET, socket.SOCK_STREAM)
 client_socket.settimeout(5)  # Set a 5-second timeout for socket operations
@@ -43,88 +50,200 @@ def send_file_to_server(file_data):
         logging.error(f"Error sending file: {e}")
         return False
 
-try:
-    logging.info("Connecting to server at %s:%d", *SERVER_ADDRESS)
-    client_socket.connect(SERVER_ADDRESS)
-    
-    files_to_send = sorted(read_image(sent_directory))
-    if not files_to_send:
-        logging.warning("No files found in the 'sent' directory to send.")
-        raise Exception("No files to send")
-    
-    for filename in files_to_send:
-        file_path = os.path.join(sent_directory, filename)
-        retries = 3  # Retry up to 3 times for each file
-        for attempt in range(retries):
-            try:
-                logging.info("Processing file: %s (Attempt %d)", filename, attempt + 1)
-                should_rotate, similarity, reason, new_password = key_rotation_manager.should_rotate_key(file_path)
-                logging.info("Key rotation decision for %s: %s (Reason: %s)", filename, should_rotate, reason)
-                
-                if should_rotate:
-                    password = new_password  # Use the new password generated by Kyber
-                    logging.info("Rotating key for file: %s", filename)
-                    password_bytes = password.encode('utf-8')
-                    password_length = len(password_bytes)
-                    client_socket.sendall(b'\x01' + struct.pack('>I', password_length) + password_bytes)
-
-                    # Wait for acknowledgment from the server after sending the new key
-                    ack = client_socket.recv(3)
-                    if ack != b"ACK":
-                        logging.error("Failed to receive acknowledgment for key rotation. Aborting.")
-                        break
-
-                filename_bytes = filename.encode('utf-8')
-                filename_length = len(filename_bytes)
-                client_socket.sendall(b'\x02' + struct.pack('>I', filename_length) + filename_bytes)
-
-                with open(file_path, 'rb') as file:
-                    data = file.read()
-                
-                serialized_data = pickle.dumps(data)
-                encrypted_data = aes_encrypt(serialized_data, password)  # Use the updated password
-                logging.info("File %s encrypted successfully.", filename)
-                
-                data_length = len(encrypted_data)
-                client_socket.sendall(struct.pack('>Q', data_length))  # Use 8 bytes for length
-                if send_file_to_server(encrypted_data):
-                    break  # Exit retry loop if file is sent successfully
-                else:
-                    logging.warning("Retrying file transfer for %s...", filename)
-
-            except socket.timeout:
-                logging.error("Timeout occurred for file %s. Retrying...", filename)
-            except Exception as e:
-                logging.error("Error processing file %s: %s", filename, e)
-                break  # Exit retry loop on non-recoverable error
-
-    logging.info("File transfer complete.")
-    
-    # Send end-of-transfer signal
-    client_socket.sendall(b'\x03')  # Send end-of-transfer flag
-    logging.info("End-of-transfer signal sent.")
+def receive_acks(unacked):
+    """
+    Wait for the ACKs of pipelined files, in the order they were sent.
 
+    The server acknowledges a file only once it is durable. Returns True if
+    every file was acknowledged; `unacked` is emptied either way.
+    """
+    received = bytearray()
     try:
-        ack = client_socket.recv(3)
-        if ack == b"ACK":
-            logging.info("Server acknowledged end-of-transfer.")
-        else:
-            logging.warning("Unexpected response from server after end-of-transfer.")
-    except ConnectionResetError:
-        logging.info("Server closed the connection after acknowledging end-of-transfer.")
+        while len(received) < 3 * len(unacked):
+            chunk = client_socket.recv(3 * len(unacked) - len(received))
+            if not chunk:
+                break
+            received.extend(chunk)
+    except socket.timeout:
+        logging.error("Timeout occurred while waiting for acknowledgments.")
     except Exception as e:
-        logging.error(f"Error waiting for server acknowledgment after end-of-transfer: {e}")
+        logging.error(f"Error waiting for acknowledgments: {e}")
 
-    # No need to wait for further messages; close the socket
-    logging.info("Closing client socket after end-of-transfer.")
+    acknowledged = 0
+    while received[3 * acknowledged:3 * acknowledged + 3] == b"ACK":
+        acknowledged += 1
+    for filename in unacked[acknowledged:]:
+        logging.warning("No acknowledgment received for %s.", filename)
+    if acknowledged:
+        logging.info("%d file(s) sent successfully.", acknowledged)
+    complete = acknowledged == len(unacked)
+    unacked.clear()
+    return complete
 
-except Exception as e:
-    logging.error("Error occurred during client operation: %s", e)
-finally:
+def send_progressive_file(file_path, filename):
+    """
+    Send an image as integer Haar bands, coarsest first, then the file itself.
+
+    The server previews the image from the bands and stores the original
+    bytes of the last stage. Each stage (a dict of fragments, see
+    progressive_stages) is pickled, compressed, encrypted and sent as a 1-byte
+    stage index and an 8-byte length followed by the ciphertext. The server
+    acknowledges once, after the last stage.
+    """
+    from client.encryption.dwt_processor import progressive_stages  # pywt and skimage are only needed here
+
+    filename_bytes = filename.encode('utf-8')
+    client_socket.sendall(b'\x04' + struct.pack('>I', len(filename_bytes)) + filename_bytes)
+
+    stages = progressive_stages(file_path)
+    for stage, fragments in enumerate(stages):
+        encrypted_data = aes_encrypt(zlib.compress(pickle.dumps(fragments)), password)
+        client_socket.sendall(struct.pack('>BQ', stage, len(encrypted_data)))
+        if stage < len(stages) - 1:
+            client_socket.sendall(encrypted_data)
+        else:
+            return send_file_to_server(encrypted_data)
+
+def send_stripe(filename, file_path, file_size, chunks):
+    """
+    Send one stripe of a large file over its own connection.
+
+    Every chunk is encrypted on its own and sent as a 0x05 message carrying the
+    filename, the total file size, the chunk size, the chunk offset and the
+    ciphertext length; the server acknowledges each chunk.
+    """
+    filename_bytes = filename.encode('utf-8')
+    with socket.create_connection(SERVER_ADDRESS, timeout=30) as stripe_socket, open(file_path, 'rb') as file:
+        for offset, length in chunks:
+            file.seek(offset)
+            encrypted_data = aes_encrypt(file.read(length), password)
+            stripe_socket.sendall(b'\x05' + struct.pack('>I', len(filename_bytes)) + filename_bytes
+                                  + struct.pack('>QQQQ', file_size, STRIPE_CHUNK_SIZE, offset, len(encrypted_data)))
+            stripe_socket.sendall(encrypted_data)
+            if stripe_socket.recv(3) != b"ACK":
+                return False
+    return True
+
+def send_striped_file(file_path, filename, file_size):
+    """Send a large file split across STRIPE_CONNECTIONS parallel connections."""
+    stripes = split_stripes(file_size, STRIPE_CONNECTIONS, STRIPE_CHUNK_SIZE)
+    logging.info("Striping %s (%d bytes) across %d connections.", filename, file_size, len(stripes))
+    with ThreadPoolExecutor(max_workers=len(stripes)) as executor:
+        results = list(executor.map(lambda chunks: send_stripe(filename, file_path, file_size, chunks), stripes))
+    if all(results):
+        logging.info("File sent successfully.")
+        return True
+    logging.warning("Not every stripe of %s was acknowledged.", filename)
+    return False
+
+def main():
+    global password  # Updated when the key rotates
     try:
-        if client_socket:
-            client_socket.shutdown(socket.SHUT_RDWR)
-            client_socket.close()
-            logging.info("Client socket closed.")
-    except:
-        logging.error("Error closing client socket.")
+        logging.info("Connecting to server at %s:%d", *SERVER_ADDRESS)
+        client_socket.connect(SERVER_ADDRESS)
+
+        files_to_send = schedule_files(sent_directory, read_image(sent_directory), SCHEDULING_POLICY,
+                                       load_schedule_manifest(sent_directory))
+        if not files_to_send:
+            logging.warning("No files found in the 'sent' directory to send.")
+            raise Exception("No files to send")
+
+        unacked = []  # Files sent whose ACK has not been read yet
+        for filename in files_to_send:
+            file_path = os.path.join(sent_directory, filename)
+            retries = 3  # Retry up to 3 times for each file
+            for attempt in range(retries):
+                try:
+                    logging.info("Processing file: %s (Attempt %d)", filename, attempt + 1)
+                    should_rotate, similarity, reason, new_password = key_rotation_manager.should_rotate_key(file_path)
+                    logging.info("Key rotation decision for %s: %s (Reason: %s)", filename, should_rotate, reason)
+
+                    if should_rotate:
+                        receive_acks(unacked)  # Only the key ACK may be pending when it is read
+                        password = new_password  # Use the new password generated by Kyber
+                        logging.info("Rotating key for file: %s", filename)
+                        password_bytes = password.encode('utf-8')
+                        password_length = len(password_bytes)
+                        client_socket.sendall(b'\x01' + struct.pack('>I', password_length) + password_bytes)
+
+                        # Wait for acknowledgment from the server after sending the new key
+                        ack = client_socket.recv(3)
+                        if ack != b"ACK":
+                            logging.error("Failed to receive acknowledgment for key rotation. Aborting.")
+                            break
+
+                    file_size = os.path.getsize(file_path)
+                    if file_size >= STRIPE_THRESHOLD or PROGRESSIVE_TRANSFER:
+                        receive_acks(unacked)
+                    if file_size >= STRIPE_THRESHOLD:
+                        if send_striped_file(file_path, filename, file_size):
+                            break
+                        logging.warning("Retrying striped transfer for %s...", filename)
+                        continue
+
+                    if PROGRESSIVE_TRANSFER:
+                        if send_progressive_file(file_path, filename):
+                            break
+                        logging.warning("Retrying progressive transfer for %s...", filename)
+                        continue
+
+                    filename_bytes = filename.encode('utf-8')
+                    filename_length = len(filename_bytes)
+                    client_socket.sendall(b'\x02' + struct.pack('>I', filename_length) + filename_bytes)
+
+                    with open(file_path, 'rb') as file:
+                        data = file.read()
+
+                    serialized_data = pickle.dumps(data)
+                    encrypted_data = aes_encrypt(serialized_data, password)  # Use the updated password
+                    logging.info("File %s encrypted successfully.", filename)
+
+                    data_length = len(encrypted_data)
+                    client_socket.sendall(struct.pack('>Q', data_length))  # Use 8 bytes for length
+                    client_socket.sendall(encrypted_data)
+                    # Keep sending while earlier files are committed; ACKs are read in batches
+                    unacked.append(filename)
+                    if len(unacked) >= PIPELINE_DEPTH:
+                        receive_acks(unacked)
+                    break
+
+                except socket.timeout:
+                    logging.error("Timeout occurred for file %s. Retrying...", filename)
+                except Exception as e:
+                    logging.error("Error processing file %s: %s", filename, e)
+                    break  # Exit retry loop on non-recoverable error
+
+        receive_acks(unacked)
+        logging.info("File transfer complete.")
+
+        # Send end-of-transfer signal
+        client_socket.sendall(b'\x03')  # Send end-of-transfer flag
+        logging.info("End-of-transfer signal sent.")
+
+        try:
+            ack = client_socket.recv(3)
+            if ack == b"ACK":
+                logging.info("Server acknowledged end-of-transfer.")
+            else:
+                logging.warning("Unexpected response from server after end-of-transfer.")
+        except ConnectionResetError:
+            logging.info("Server closed the connection after acknowledging end-of-transfer.")
+        except Exception as e:
+            logging.error(f"Error waiting for server acknowledgment after end-of-transfer: {e}")
+
+        # No need to wait for further messages; close the socket
+        logging.info("Closing client socket after end-of-transfer.")
+
+    except Exception as e:
+        logging.error("Error occurred during client operation: %s", e)
+    finally:
+        try:
+            if client_socket:
+                client_socket.shutdown(socket.SHUT_RDWR)
+                client_socket.close()
+                logging.info("Client socket closed.")
+        except:
+            logging.error("Error closing client socket.")
+
+if __name__ == "__main__":
+    main()
@@ -2,7 +2,7 @@ import os
 import hashlib
 from Crypto.Cipher import AES
 from Crypto.Util.Padding import pad, unpad
-from shared.crypto_utils import derive_key
+from shared.crypto_utils import derive_key, as_byte_view
 
 def generate_aes_key(password):
     """
@@ -14,19 +14,51 @@ def generate_aes_key(password):
     Returns:
         bytes: The derived AES key.
     """
-    sha256_hash = hashlib.sha256(password.encode()).digest()
-    return sha256_hash
+    return derive_key(password)  # Same SHA-256 derivation, cached per password
 
 def calculate_checksum(data):
     """Calculate and return the SHA-256 checksum of the given data."""
     return hashlib.sha256(data).hexdigest()
 
+def aes_encrypted_size(data_length):
+    """Return the size of the IV-prefixed, PKCS#7-padded ciphertext for a plaintext length."""
+    return AES.block_size + (data_length // AES.block_size + 1) * AES.block_size
+
+def aes_encrypt_into(data, password, out):
+    """
+    Encrypts the given data using AES-256 into a caller-supplied buffer.
+
+    The IV is written first, followed by the ciphertext. Full blocks are
+    encrypted straight from the input buffer; only the last, padded block
+    is copied.
+
+    Args:
+        data: Plaintext in any buffer (bytes, bytearray, memoryview, np.ndarray).
+        password: The password to derive the AES key from.
+        out: Writable buffer of at least aes_encrypted_size(len(data)) bytes.
+
+    Returns:
+        int: Number of bytes written to `out`.
+    """
+    with as_byte_view(data) as view, as_byte_view(out) as target:  # Released on every exit, see aes_decrypt_into
+        total = aes_encrypted_size(len(view))
+        if len(target) < total:
+            raise ValueError(f"Output buffer too small: {len(target)} < {total}")
+
+        cipher = AES.new(derive_key(password), AES.MODE_CBC)
+        target[:AES.block_size] = cipher.iv
+        full = len(view) - len(view) % AES.block_size
+        if full:
+            cipher.encrypt(view[:full], output=target[AES.block_size:AES.block_size + full])
+        last_block = pad(bytes(view[full:]), AES.block_size)
+        cipher.encrypt(last_block, output=target[AES.block_size + full:total])
+        return total
+
 def aes_encrypt(data, password):
     """Encrypts the given data using AES-256 encryption."""
-    key = derive_key(password)
-    cipher = AES.new(key, AES.MODE_CBC)
-    iv = cipher.iv
-    ciphertext = iv + cipher.encrypt(pad(data, AES.block_size))
+    with as_byte_view(data) as view:
+        ciphertext = bytearray(aes_encrypted_size(len(view)))
+    aes_encrypt_into(data, password, ciphertext)
     return ciphertext
 
 def encrypt_image_fragment(fragment, password):
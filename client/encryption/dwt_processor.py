@@ -12,6 +12,10 @@ class DWTProcessor:
         ll2, (lh2, hl2, hh2), (lh, hl, hh) = coeffs
         return ll2, (lh2, hl2, hh2), (lh, hl, hh)
 
+    def metadata(self):
+        """Return the dtype and shape of the loaded image, needed to rescale and crop the reconstruction."""
+        return {'dtype': self.image.dtype.str, 'shape': self.image.shape}
+
     def extract_fragments(self):
         ll2, (lh2, hl2, hh2), (lh, hl, hh) = self.decompose()
         return ll2, lh2, hl2, hh2
@@ -23,7 +27,70 @@ class DWTProcessor:
         io.imsave(f"{output_prefix}_hl2.png", hl2)
         io.imsave(f"{output_prefix}_hh2.png", hh2)
 
+def haar_step(image):
+    """
+    One level of the integer Haar (S-) transform over the first two axes.
+
+    Every channel is transformed on its own. Odd dimensions are padded by
+    repeating the last row or column. For integer images the approximation is
+    floor((a + b) / 2) of each pair, so it stays in the source range and the
+    step inverts exactly; float images use the plain mean.
+
+    Returns:
+        tuple: (ll, (lh, hl, hh)) as int64 arrays (float64 for float images).
+    """
+    integer = image.dtype.kind in 'uib'
+    x = image.astype(np.int64 if integer else np.float64)
+    x = np.pad(x, [(0, x.shape[0] % 2), (0, x.shape[1] % 2)] + [(0, 0)] * (x.ndim - 2), mode='edge')
+
+    def split(a, b):
+        d = a - b
+        return b + (d >> 1 if integer else d / 2), d
+
+    s, d = split(x[:, 0::2], x[:, 1::2])
+    ll, lh = split(s[0::2], s[1::2])
+    hl, hh = split(d[0::2], d[1::2])
+    return ll, (lh, hl, hh)
+
 # Add a standalone function for convenience
 def process_image(image_path):
     processor = DWTProcessor(image_path)
-    return processor.decompose()
\ No newline at end of file
+    return processor.decompose()
+
+def progressive_stages(image_path, levels=3):
+    """
+    Return an image as progressive transfer stages, coarse to fine.
+
+    The image is decoded in its own dtype and channels and decomposed with
+    `haar_step`. The stages are dicts of fragments:
+      - 'll': the level-`levels` approximation in the source dtype, with
+        'meta' (source dtype, shape and levels),
+      - 'details': its detail bands as the smallest signed integers that hold
+        them, which invert exactly to the approximation one level finer,
+      - 'original': the file bytes, so the stored file is the sent file.
+    Level 3 is the default because a lossless level-2 approximation is about
+    as large as a typical JPEG of the whole image.
+    """
+    image = io.imread(image_path)
+    if image.ndim > 3:
+        image = image[0]  # First frame of an animation
+    if image.dtype == bool:
+        image = image.astype(np.uint8) * 255
+
+    ll = image
+    for _ in range(levels):
+        ll, details = haar_step(ll)
+    if image.dtype.kind in 'ui':
+        ll_dtype = image.dtype  # Floor means stay in the source range
+        band_dtype = np.dtype(f'i{min(2 * image.dtype.itemsize, 8)}')
+    else:
+        ll_dtype = band_dtype = np.dtype(np.float32)  # Only used for previews
+
+    with open(image_path, 'rb') as f:
+        original = f.read()
+    meta = {'dtype': image.dtype.str, 'shape': image.shape, 'levels': levels}
+    return [
+        {'ll': ll.astype(ll_dtype), 'meta': meta},
+        {'details': tuple(band.astype(band_dtype) for band in details)},
+        {'original': original},
+    ]
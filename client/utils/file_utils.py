@@ -1,5 +1,4 @@
 import os
-from PIL import Image
 
 def read_image(directory):
     """
@@ -0,0 +1,83 @@
+import os
+import json
+
+SCHEDULING_POLICIES = ['name', 'sjf', 'priority', 'deadline']
+
+def load_schedule_manifest(directory, manifest_name='schedule.json'):
+    """
+    Load optional per-file scheduling hints from a JSON manifest.
+
+    The manifest maps filenames to {"priority": int, "deadline": float}, where
+    a lower priority value is sent earlier and the deadline is a Unix timestamp.
+
+    Args:
+        directory (str): Directory containing the files to send.
+        manifest_name (str): Name of the manifest file inside the directory.
+
+    Returns:
+        dict: Filename -> hints, empty if there is no manifest.
+    """
+    manifest_path = os.path.join(directory, manifest_name)
+    if not os.path.exists(manifest_path):
+        return {}
+    try:
+        with open(manifest_path, 'r') as f:
+            return json.load(f)
+    except Exception as e:
+        print(f"Error reading schedule manifest {manifest_path}: {e}")
+        return {}
+
+def schedule_files(directory, filenames, policy='sjf', hints=None):
+    """
+    Order files for sending.
+
+    Policies:
+        name: alphabetical order.
+        sjf: shortest job first, smallest files first.
+        priority: by the "priority" hint, then by size.
+        deadline: earliest "deadline" hint first, then by size; files without
+            a deadline go last.
+
+    Args:
+        directory (str): Directory containing the files.
+        filenames (list): Filenames to schedule.
+        policy (str): One of SCHEDULING_POLICIES.
+        hints (dict): Per-file hints as returned by load_schedule_manifest.
+
+    Returns:
+        list: The filenames in sending order.
+    """
+    if policy not in SCHEDULING_POLICIES:
+        raise ValueError(f"Unknown scheduling policy: {policy}")
+    hints = hints or {}
+
+    def size(filename):
+        return os.path.getsize(os.path.join(directory, filename))
+
+    if policy == 'name':
+        return sorted(filenames)
+    if policy == 'sjf':
+        return sorted(filenames, key=lambda f: (size(f), f))
+    if policy == 'priority':
+        return sorted(filenames, key=lambda f: (hints.get(f, {}).get('priority', 0), size(f), f))
+    return sorted(filenames, key=lambda f: (hints.get(f, {}).get('deadline', float('inf')), size(f), f))
+
+def split_stripes(file_size, stripe_count, chunk_size):
+    """
+    Split a file into per-connection lists of (offset, length) chunks.
+
+    The file is cut into contiguous stripes, one per connection, and every
+    stripe into chunks of chunk_size bytes (the last chunk of the file may be
+    shorter). Stripe boundaries fall on multiples of chunk_size, which the
+    server requires.
+
+    Returns:
+        list: One list of (offset, length) tuples per connection.
+    """
+    stripe_size = -(-file_size // stripe_count)  # Ceiling division
+    stripe_size = -(-stripe_size // chunk_size) * chunk_size
+    stripes = []
+    for start in range(0, file_size, stripe_size):
+        end = min(start + stripe_size, file_size)
+        stripes.append([(offset, min(chunk_size, end - offset)) for offset in range(start, end, chunk_size)])
+    return stripes
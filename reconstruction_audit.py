@@ -0,0 +1,252 @@
+"""
+Bulk audit of reconstruction and transfer quality.
+
+Walks a tree of original images and, for each one, scores
+  - roundtrip: DWTProcessor.decompose -> DWTReconstructor.reconstruct_image
+    against the image DWTProcessor loaded, and
+  - transfer: the received copy against the original (byte-identical files
+    are accepted without decoding),
+with MSE, PSNR and optionally SSIM. Work runs on a process pool in chunks of
+files, rows are streamed to a CSV, JSON or JSON Lines report as they come in,
+and rows below the quality thresholds are flagged.
+
+Usage: python reconstruction_audit.py ORIGINALS RECEIVED -o report.csv [options]
+"""
+import os
+import sys
+import csv
+import json
+import math
+import time
+import hashlib
+import logging
+import argparse
+from functools import partial
+from concurrent.futures import ProcessPoolExecutor
+
+logging.basicConfig(level=logging.INFO, format='%(asctime)s - %(levelname)s - %(message)s')
+
+IMAGE_EXTENSIONS = ('.jpg', '.jpeg', '.png', '.bmp', '.tiff', '.gif')
+REPORT_FIELDS = ['original', 'received', 'check', 'identical', 'mse', 'psnr', 'ssim', 'flagged', 'error']
+ROWS_PER_CHUNK = 256  # Image rows per NumPy chunk when computing the MSE
+
+def find_pairs(original_dir, received_dir):
+    """
+    Pair every original image with its received copy.
+
+    Received files are matched by relative path first and by filename second,
+    so both the flat and the sharded server layouts are supported. A filename
+    found in several received subdirectories is ambiguous and is not guessed.
+
+    Returns:
+        list: (original_path, received_path, problem) tuples; received_path is
+            None and problem says why when there is no unique copy.
+    """
+    by_relative, by_name = {}, {}
+    for root, _, files in os.walk(received_dir):
+        for name in files:
+            path = os.path.join(root, name)
+            by_relative[os.path.relpath(path, received_dir)] = path
+            by_name.setdefault(name, []).append(path)
+
+    pairs = []
+    for root, _, files in os.walk(original_dir):
+        for name in sorted(files):
+            if not name.lower().endswith(IMAGE_EXTENSIONS):
+                continue
+            path = os.path.join(root, name)
+            relative = os.path.relpath(path, original_dir)
+            candidates = [by_relative[relative]] if relative in by_relative else by_name.get(name, [])
+            if len(candidates) == 1:
+                pairs.append((path, candidates[0], None))
+            elif candidates:
+                pairs.append((path, None, f"Ambiguous received copy: {', '.join(sorted(candidates))}"))
+            else:
+                pairs.append((path, None, "No received copy"))
+    return sorted(pairs, key=lambda pair: pair[0])
+
+def dtype_scale(dtype):
+    """Return the factor mapping values of dtype to [0, 1], as img_as_float does."""
+    import numpy as np
+
+    if np.issubdtype(dtype, np.integer):
+        return 1.0 / np.iinfo(dtype).max
+    return 1.0
+
+def chunked_mse(image1, image2, rows=ROWS_PER_CHUNK):
+    """
+    Compute the MSE of two images normalized to [0, 1].
+
+    The images stay in their own dtype (uint8 as decoded); each chunk of rows
+    is converted to float32 and scaled on its own, so memory stays bounded.
+    """
+    import numpy as np
+    from ID_MSE import compute_mse
+
+    scale1, scale2 = dtype_scale(image1.dtype), dtype_scale(image2.dtype)
+    total = 0.0
+    for start in range(0, image1.shape[0], rows):
+        a = image1[start:start + rows].astype(np.float32) * np.float32(scale1)
+        b = image2[start:start + rows].astype(np.float32) * np.float32(scale2)
+        total += float(compute_mse(a, b)) * a.size
+    return total / image1.size
+
+def score(reference, candidate, with_ssim):
+    """Return (mse, psnr, ssim) of two images normalized to [0, 1]."""
+    if reference.shape != candidate.shape:
+        raise ValueError(f"Shape mismatch: {reference.shape} != {candidate.shape}")
+
+    mse = chunked_mse(reference, candidate)
+    psnr = math.inf if mse == 0 else 10 * math.log10(1.0 / mse)
+    ssim = None
+    if with_ssim:
+        # SSIM needs whole images; this is the only full float conversion
+        from skimage import img_as_float
+        from skimage.metrics import structural_similarity
+        channel_axis = -1 if reference.ndim == 3 else None
+        ssim = float(structural_similarity(img_as_float(reference), img_as_float(candidate),
+                                           data_range=1.0, channel_axis=channel_axis))
+    return mse, psnr, ssim
+
+def audit_roundtrip(original_path, with_ssim):
+    """Score the DWT decomposition and reconstruction of one image."""
+    from client.encryption.dwt_processor import DWTProcessor
+    from server.decryption.dwt_reconstructor import DWTReconstructor
+
+    processor = DWTProcessor(original_path)
+    ll2, details2, details1 = processor.decompose()
+    fragments = {'ll2': ll2, 'lh2_hl2_hh2': details2, 'lh_hl_hh': details1, 'meta': processor.metadata()}
+    reconstructed = DWTReconstructor().reconstruct_image(fragments, None)
+    return score(processor.image, reconstructed, with_ssim)
+
+def file_digest(path, block_size=1 << 20):
+    """Return the SHA-256 digest of a file, read in blocks."""
+    digest = hashlib.sha256()
+    with open(path, 'rb') as f:
+        for block in iter(lambda: f.read(block_size), b''):
+            digest.update(block)
+    return digest.digest()
+
+def audit_transfer(original_path, received_path, with_ssim):
+    """Score a received copy against its original; identical bytes skip decoding."""
+    if os.path.getsize(original_path) == os.path.getsize(received_path) \
+            and file_digest(original_path) == file_digest(received_path):
+        return True, (0.0, math.inf, 1.0 if with_ssim else None)
+
+    from skimage import io
+    return False, score(io.imread(original_path), io.imread(received_path), with_ssim)
+
+def audit_chunk(pairs, checks, with_ssim, min_psnr, min_ssim):
+    """Audit a chunk of pairs in a worker process and return the report rows."""
+    rows = []
+    for original_path, received_path, problem in pairs:
+        for check in checks:
+            row = dict.fromkeys(REPORT_FIELDS)
+            row.update(original=original_path, received=received_path, check=check, flagged=False)
+            try:
+                if check == 'roundtrip':
+                    row['mse'], row['psnr'], row['ssim'] = audit_roundtrip(original_path, with_ssim)
+                elif received_path is None:
+                    raise LookupError(problem)
+                else:
+                    row['identical'], (row['mse'], row['psnr'], row['ssim']) = \
+                        audit_transfer(original_path, received_path, with_ssim)
+                row['flagged'] = row['psnr'] < min_psnr or (row['ssim'] is not None and row['ssim'] < min_ssim)
+            except Exception as e:
+                row['error'] = str(e)
+                row['flagged'] = True
+            rows.append(row)
+    return rows
+
+class ReportWriter:
+    """Streams report rows to CSV, JSON (a single array) or JSON Lines, chosen by extension."""
+
+    def __init__(self, path):
+        self.format = os.path.splitext(path)[1].lower().lstrip('.')
+        if self.format not in ('csv', 'json', 'jsonl'):
+            raise ValueError(f"Unsupported report format: {path}")
+        self.file = open(path, 'w', newline='')
+        self.count = 0
+        if self.format == 'csv':
+            self.writer = csv.DictWriter(self.file, fieldnames=REPORT_FIELDS)
+            self.writer.writeheader()
+        elif self.format == 'json':
+            self.file.write('[\n')
+
+    def write(self, row):
+        if self.format == 'csv':
+            self.writer.writerow(row)
+        else:
+            # inf is not valid JSON; identical images are reported with a null PSNR
+            row = {k: (None if isinstance(v, float) and math.isinf(v) else v) for k, v in row.items()}
+            if self.format == 'json' and self.count:
+                self.file.write(',\n')
+            self.file.write(json.dumps(row))
+            if self.format == 'jsonl':
+                self.file.write('\n')
+        self.count += 1
+
+    def close(self):
+        if self.format == 'json':
+            self.file.write('\n]\n')
+        self.file.close()
+
+def run_audit(original_dir, received_dir, report_path, checks=('roundtrip', 'transfer'), workers=None,
+              chunk_size=64, with_ssim=False, min_psnr=40.0, min_ssim=0.98):
+    """
+    Audit every image under original_dir and stream the rows to report_path.
+
+    Returns:
+        dict: Summary with the number of rows, flagged rows and the worst rows.
+    """
+    pairs = find_pairs(original_dir, received_dir)
+    chunks = [pairs[i:i + chunk_size] for i in range(0, len(pairs), chunk_size)]
+    logging.info("Auditing %d image(s) in %d chunk(s).", len(pairs), len(chunks))
+
+    start_time = time.time()
+    writer = ReportWriter(report_path)
+    flagged = []
+    try:
+        with ProcessPoolExecutor(max_workers=workers) as executor:
+            task = partial(audit_chunk, checks=checks, with_ssim=with_ssim, min_psnr=min_psnr, min_ssim=min_ssim)
+            results = executor.map(task, chunks)
+            for done, rows in enumerate(results, 1):
+                for row in rows:
+                    writer.write(row)
+                    if row['flagged']:
+                        flagged.append(row)
+                if done % 10 == 0 or done == len(chunks):
+                    elapsed = time.time() - start_time
+                    logging.info("%d/%d chunks, %.1f images/s, %d flagged",
+                                 done, len(chunks), min(done * chunk_size, len(pairs)) / elapsed, len(flagged))
+    finally:
+        writer.close()
+
+    worst = sorted(flagged, key=lambda row: (row['error'] is None, row['psnr'] or 0))[:10]
+    for row in worst:
+        logging.warning("Flagged %s (%s): psnr=%s ssim=%s %s", row['original'], row['check'],
+                        row['psnr'], row['ssim'], row['error'] or '')
+    return {'rows': writer.count, 'flagged': len(flagged), 'worst': worst}
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Audit DWT reconstruction and transfer quality in bulk.")
+    parser.add_argument('original_dir', help="Tree of original images")
+    parser.add_argument('received_dir', help="Tree of received images (flat or sharded layout)")
+    parser.add_argument('-o', '--report', required=True, help="Report path ending in .csv, .json or .jsonl")
+    parser.add_argument('--check', choices=['roundtrip', 'transfer'], action='append',
+                        help="Checks to run (default: both)")
+    parser.add_argument('-j', '--workers', type=int, default=None, help="Worker processes (default: CPU count)")
+    parser.add_argument('--chunk-size', type=int, default=64, help="Images per worker task")
+    parser.add_argument('--ssim', action='store_true', help="Also compute SSIM (slower)")
+    parser.add_argument('--min-psnr', type=float, default=40.0, help="Flag rows below this PSNR in dB")
+    parser.add_argument('--min-ssim', type=float, default=0.98, help="Flag rows below this SSIM")
+    args = parser.parse_args(argv)
+
+    summary = run_audit(args.original_dir, args.received_dir, args.report,
+                        tuple(args.check or ('roundtrip', 'transfer')), args.workers,
+                        args.chunk_size, args.ssim, args.min_psnr, args.min_ssim)
+    logging.info("Wrote %d row(s) to %s, %d flagged.", summary['rows'], args.report, summary['flagged'])
+    return 1 if summary['flagged'] else 0
+
+if __name__ == "__main__":
+    sys.exit(main())
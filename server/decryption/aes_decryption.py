@@ -1,19 +1,47 @@
 import os
 import hashlib
 from Crypto.Cipher import AES
-from Crypto.Util.Padding import unpad
-from shared.crypto_utils import derive_key
+from shared.crypto_utils import derive_key, as_byte_view
 
 def calculate_checksum(data):
     return hashlib.sha256(data).hexdigest()
 
+def aes_decrypt_into(ciphertext, password, out):
+    """
+    Decrypt IV-prefixed AES-256-CBC ciphertext into a caller-supplied buffer.
+
+    Args:
+        ciphertext: Ciphertext in any buffer (bytes, bytearray, memoryview, mmap).
+        password: The password to derive the AES key from.
+        out: Writable buffer of at least len(ciphertext) - 16 bytes.
+
+    Returns:
+        int: Length of the unpadded plaintext at the start of `out`.
+    """
+    # Release both views on every exit: a view left to a traceback would keep
+    # an mmap'ed ciphertext exported and make closing the mmap fail
+    with as_byte_view(ciphertext) as view, as_byte_view(out) as target:
+        length = len(view) - AES.block_size
+        if length <= 0 or length % AES.block_size:
+            raise ValueError("Ciphertext length is not a positive multiple of the block size.")
+        if len(target) < length:
+            raise ValueError(f"Output buffer too small: {len(target)} < {length}")
+
+        cipher = AES.new(derive_key(password), AES.MODE_CBC, iv=bytes(view[:AES.block_size]))
+        cipher.decrypt(view[AES.block_size:], output=target[:length])
+
+        # PKCS#7 unpadding without copying the plaintext
+        padding = target[length - 1]
+        if not 1 <= padding <= AES.block_size or target[length - padding:length] != bytes([padding]) * padding:
+            raise ValueError("Padding is incorrect.")
+        return length - padding
+
 def aes_decrypt(ciphertext, password):
-    key = derive_key(password)
-    iv = ciphertext[:16]
-    ct = ciphertext[16:]
-    cipher = AES.new(key, AES.MODE_CBC, iv=iv)
-    decrypted = unpad(cipher.decrypt(ct), AES.block_size)
-    return decrypted
+    with as_byte_view(ciphertext) as view:
+        plaintext = bytearray(max(len(view) - AES.block_size, 0))
+    length = aes_decrypt_into(ciphertext, password, plaintext)
+    del plaintext[length:]  # Truncating the tail of a bytearray does not copy
+    return plaintext
 
 def save_decrypted_image(decrypted_data, output_path):
     with open(output_path, 'wb') as file:
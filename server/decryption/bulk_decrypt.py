@@ -0,0 +1,235 @@
+import os
+import sys
+import mmap
+import glob
+import json
+import time
+import queue
+import pickle
+import fnmatch
+import logging
+import argparse
+import threading
+from concurrent.futures import ProcessPoolExecutor, FIRST_COMPLETED, wait
+from server.decryption.aes_decryption import aes_decrypt
+
+logging.basicConfig(level=logging.INFO, format='%(asctime)s - %(levelname)s - %(message)s')
+
+ENCRYPTED_SUFFIX = '.enc'
+
+def glob_base(pattern):
+    """Return the directory part of a glob pattern before its first wildcard."""
+    parts = pattern.split(os.sep)[:-1]
+    prefix = []
+    for part in parts:
+        if any(c in part for c in '*?['):
+            break
+        prefix.append(part)
+    base = os.sep.join(prefix)
+    if not base:
+        return os.sep if pattern.startswith(os.sep) else '.'
+    return base
+
+def collect_inputs(patterns):
+    """
+    Expand directories and glob patterns into (input_path, relative_path) pairs.
+
+    Directories are walked recursively and keep their layout below the
+    directory; files matched by a glob keep their path below the pattern's
+    non-wildcard prefix, so 'arch/*/*.enc' yields 'epoch_0003/f.enc'.
+    """
+    inputs = []
+    for pattern in patterns:
+        if os.path.isdir(pattern):
+            for root, _, files in os.walk(pattern):
+                for name in files:
+                    path = os.path.join(root, name)
+                    inputs.append((path, os.path.relpath(path, pattern)))
+        else:
+            base = glob_base(pattern)
+            for path in glob.glob(pattern, recursive=True):
+                if os.path.isfile(path):
+                    inputs.append((path, os.path.relpath(path, base)))
+    return sorted(inputs)
+
+def load_key_map(key_map_path):
+    """
+    Load a JSON key map of {pattern: password}.
+
+    Patterns are fnmatch globs matched against the relative path of each
+    input, e.g. {"epoch_0003/*": "..."}; the first matching entry wins.
+    """
+    with open(key_map_path, 'r') as f:
+        return list(json.load(f).items())
+
+def password_for(relative_path, key_map, default_password):
+    """Return the password for an input, falling back to the default password."""
+    for pattern, password in key_map:
+        if fnmatch.fnmatch(relative_path, pattern):
+            return password
+    return default_password
+
+def output_path_for(relative_path, output_dir):
+    """Return the output path for an input, dropping a trailing .enc suffix."""
+    if relative_path.endswith(ENCRYPTED_SUFFIX):
+        relative_path = relative_path[:-len(ENCRYPTED_SUFFIX)]
+    return os.path.join(output_dir, relative_path)
+
+def decrypt_file(input_path, password, unpickle=False):
+    """
+    Decrypt one memory-mapped ciphertext file with aes_decrypt.
+
+    Runs in a worker process. Returns the plaintext and the ciphertext size.
+    aes_decrypt releases its views of the mapping on every exit, so the mmap
+    closes and a wrong key or corrupt file raises its own ValueError.
+    """
+    with open(input_path, 'rb') as f:
+        size = os.fstat(f.fileno()).st_size
+        if size == 0:
+            raise ValueError("Empty ciphertext file.")
+        with mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ) as ciphertext:
+            decrypted = aes_decrypt(ciphertext, password)
+    if unpickle:
+        decrypted = pickle.loads(decrypted)  # Payloads captured from the wire are pickled
+    return decrypted, size
+
+def write_output(output_path, data):
+    """Write a file atomically so a partial output is never mistaken for a finished one."""
+    os.makedirs(os.path.dirname(output_path) or '.', exist_ok=True)
+    temp_path = output_path + '.part'
+    with open(temp_path, 'wb') as f:
+        f.write(data)
+    os.replace(temp_path, output_path)
+
+def writer_loop(write_queue, stats):
+    """Drain the write queue until a None sentinel arrives."""
+    while True:
+        item = write_queue.get()
+        if item is None:
+            break
+        output_path, data = item
+        try:
+            write_output(output_path, data)
+            stats['written'] += 1
+        except Exception as e:
+            stats['write_failed'] += 1  # Only the writer thread touches this counter
+            logging.error("Error writing %s: %s", output_path, e)
+
+def log_throughput(stats, start_time, total):
+    elapsed = max(time.time() - start_time, 1e-9)
+    failed = stats['failed'] + stats['write_failed']
+    done = stats['written'] + failed
+    logging.info("%d/%d files, %.1f files/s, %.2f MB/s (%d skipped, %d failed)",
+                 done, total, done / elapsed, stats['bytes'] / elapsed / 1e6,
+                 stats['skipped'], failed)
+
+def bulk_decrypt(patterns, output_dir, default_password=None, key_map=(), workers=None,
+                 queue_size=64, unpickle=False, report_interval=5.0):
+    """
+    Decrypt every input on a process pool and write the results under output_dir.
+
+    Inputs whose output already exists are skipped, so an interrupted run can
+    simply be restarted. Two inputs that map to the same output (e.g. f.enc
+    under two input directories) raise ValueError before anything is written. Decryptions in flight and decrypted files waiting
+    for the writer thread together never exceed queue_size, so at most
+    queue_size plaintexts (plus the one being written) are held in memory.
+
+    Returns:
+        dict: Counters for written, skipped, failed and write_failed files and ciphertext bytes.
+    """
+    stats = {'written': 0, 'skipped': 0, 'failed': 0, 'write_failed': 0, 'bytes': 0}
+    inputs = []
+    sources = {}  # output_path -> input_path
+    for input_path, relative_path in collect_inputs(patterns):
+        output_path = output_path_for(relative_path, output_dir)
+        if output_path in sources:
+            if sources[output_path] != input_path:
+                raise ValueError(f"{sources[output_path]} and {input_path} would both be written to {output_path}")
+            continue  # The same file matched by two patterns
+        sources[output_path] = input_path
+        inputs.append((input_path, relative_path, output_path))
+
+    tasks = []
+    for input_path, relative_path, output_path in inputs:
+        if os.path.exists(output_path):
+            stats['skipped'] += 1
+            continue
+        password = password_for(relative_path, key_map, default_password)
+        if password is None:
+            logging.error("No password for %s; skipping.", input_path)
+            stats['failed'] += 1
+            continue
+        tasks.append((input_path, output_path, password))
+
+    logging.info("%d file(s) to decrypt, %d already done.", len(tasks), stats['skipped'])
+    write_queue = queue.Queue(maxsize=queue_size)
+    writer = threading.Thread(target=writer_loop, args=(write_queue, stats), daemon=True)
+    writer.start()
+
+    start_time = last_report = time.time()
+    pending = {}
+    task_iter = iter(tasks)
+    exhausted = False
+    with ProcessPoolExecutor(max_workers=workers) as executor:
+        while True:
+            # Decryptions in flight and results awaiting the writer share one bound
+            while not exhausted and len(pending) + write_queue.qsize() < queue_size:
+                task = next(task_iter, None)
+                if task is None:
+                    exhausted = True
+                    break
+                input_path, output_path, password = task
+                future = executor.submit(decrypt_file, input_path, password, unpickle)
+                pending[future] = (input_path, output_path)
+            if not pending:
+                if exhausted:
+                    break
+                time.sleep(0.01)  # The writer is behind; wait for room
+                continue
+
+            done, _ = wait(pending, return_when=FIRST_COMPLETED)
+            for future in done:
+                input_path, output_path = pending.pop(future)
+                try:
+                    data, size = future.result()
+                except Exception as e:
+                    stats['failed'] += 1
+                    logging.error("Error decrypting %s: %s", input_path, e)
+                    continue
+                stats['bytes'] += size
+                write_queue.put((output_path, data))
+
+            if time.time() - last_report >= report_interval:
+                log_throughput(stats, start_time, len(tasks))
+                last_report = time.time()
+
+    write_queue.put(None)
+    writer.join()
+    log_throughput(stats, start_time, len(tasks))
+    return stats
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Decrypt archives of captured AES ciphertext in bulk.")
+    parser.add_argument('inputs', nargs='+', help="Directories or glob patterns of ciphertext files")
+    parser.add_argument('-o', '--output-dir', required=True, help="Directory for decrypted files")
+    parser.add_argument('-p', '--password', help="Password used when no key map entry matches")
+    parser.add_argument('-k', '--key-map', help="JSON file mapping path globs (e.g. epoch directories) to passwords")
+    parser.add_argument('-j', '--workers', type=int, default=None, help="Worker processes (default: CPU count)")
+    parser.add_argument('-q', '--queue-size', type=int, default=64, help="Maximum decrypted files held in memory")
+    parser.add_argument('--unpickle', action='store_true', help="Unpickle each plaintext (payloads captured from the wire)")
+    args = parser.parse_args(argv)
+
+    if args.password is None and args.key_map is None:
+        parser.error("one of --password or --key-map is required")
+    key_map = load_key_map(args.key_map) if args.key_map else []
+
+    try:
+        stats = bulk_decrypt(args.inputs, args.output_dir, args.password, key_map,
+                             args.workers, args.queue_size, args.unpickle)
+    except ValueError as e:  # Colliding outputs; nothing has been written
+        logging.error("%s", e)
+        return 2
+    return 1 if stats['failed'] or stats['write_failed'] else 0
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -3,6 +3,64 @@ import pywt
 import cv2
 from shared.crypto_utils import derive_key
 
+# Fragment names in the order they are sent by a progressive transfer
+PROGRESSIVE_STAGES = ['ll', 'details', 'original']
+
+def to_uint8(image, meta=None):
+    """
+    Convert reconstructed coefficients to a displayable uint8 image.
+
+    The reconstruction is in the units of the source image: [0, 1] for float
+    images (DWTProcessor loads color files as float grayscale), the full
+    integer range otherwise. Without metadata the values are taken as 0..255.
+
+    Args:
+        image: Reconstructed image as a numpy array.
+        meta: Optional {'dtype', 'shape'} of the source image, as sent with LL2.
+    """
+    if meta is not None:
+        dtype = np.dtype(meta['dtype'])
+        if dtype.kind == 'f':
+            image = image * 255
+        elif dtype.kind in 'ui' and dtype.itemsize > 1:
+            image = image * (255 / np.iinfo(dtype).max)
+    return np.clip(np.rint(image), 0, 255).astype(np.uint8)
+
+def crop(image, shape):
+    """Crop the padding waverec2/idwt2 add for odd dimensions."""
+    return image[:shape[0], :shape[1]]
+
+def half_shape(shape, levels=1):
+    """Return the shape of the Haar approximation `levels` levels below `shape`."""
+    height, width = shape[:2]
+    for _ in range(levels):
+        height, width = -(-height // 2), -(-width // 2)
+    return height, width
+
+def inverse_haar_step(ll, details, shape):
+    """
+    Invert one level of the integer Haar transform (see DWTProcessor's haar_step).
+
+    Integer bands are inverted exactly. The result is cropped to `shape`, the
+    size of the approximation before its odd dimensions were padded.
+    """
+    lh, hl, hh = details
+    integer = ll.dtype.kind in 'ui'
+    work = np.int64 if integer else np.float64
+
+    def merge(s, d):
+        s, d = s.astype(work), d.astype(work)
+        b = s - (d >> 1 if integer else d / 2)
+        a = d + b
+        out = np.empty((2 * a.shape[0],) + a.shape[1:], dtype=work)
+        out[0::2], out[1::2] = a, b
+        return out
+
+    s = merge(ll, lh)
+    d = merge(hl, hh)
+    x = np.moveaxis(merge(np.moveaxis(s, 1, 0), np.moveaxis(d, 1, 0)), 0, 1)
+    return crop(x, shape)
+
 class DWTReconstructor:
     def __init__(self):
         self.wavelet = 'haar'  # You can choose other wavelets as needed
@@ -12,7 +70,8 @@ class DWTReconstructor:
         Reconstruct the image from the provided fragments.
 
         Args:
-            fragments: A dictionary containing the decrypted image fragments.
+            fragments: A dictionary containing the decrypted image fragments,
+                and optionally 'meta' with the source dtype and shape.
             key: The AES key used for decryption.
 
         Returns:
@@ -27,7 +86,34 @@ class DWTReconstructor:
         coeffs = [fragments['ll2'], fragments['lh2_hl2_hh2'], fragments['lh_hl_hh']]
         reconstructed_image = pywt.waverec2(coeffs, self.wavelet)
 
-        return np.clip(reconstructed_image, 0, 255).astype(np.uint8)
+        meta = fragments.get('meta')
+        if meta is not None:
+            reconstructed_image = crop(reconstructed_image, meta['shape'])
+        return to_uint8(reconstructed_image, meta)
+
+    def preview_image(self, fragments):
+        """
+        Build the best preview available from the progressive fragments received so far.
+
+        With only the approximation the preview is 1/2**levels of the full
+        size in each dimension (1/8 by default); with its details the next
+        finer approximation is recovered exactly and the preview is twice as
+        large. The full image is the original file, sent last.
+
+        Args:
+            fragments: A dictionary containing 'll' and 'meta', and optionally 'details'.
+
+        Returns:
+            Preview image as a uint8 numpy array with the source's channels.
+        """
+        for key in ('ll', 'meta'):
+            if key not in fragments:
+                raise ValueError(f"Missing fragment: {key}")
+        meta = fragments['meta']
+        if 'details' not in fragments:
+            return to_uint8(fragments['ll'], meta)
+        shape = half_shape(meta['shape'], meta['levels'] - 1)
+        return to_uint8(inverse_haar_step(fragments['ll'], fragments['details'], shape), meta)
 
     def save_reconstructed_image(self, image, output_path):
         """
@@ -42,4 +128,8 @@ class DWTReconstructor:
 # Add a standalone function for convenience
 def reconstruct_image(fragments, key):
     reconstructor = DWTReconstructor()
-    return reconstructor.reconstruct_image(fragments, key)
\ No newline at end of file
+    return reconstructor.reconstruct_image(fragments, key)
+
+def preview_image(fragments):
+    reconstructor = DWTReconstructor()
+    return reconstructor.preview_image(fragments)
@@ -1,31 +1,115 @@
 import socket
 import os
+import select
 import struct
+import zlib
 import pickle
 import hashlib
 import logging
 import time  # Import time for periodic logging
+import threading
 from server.decryption.aes_decryption import aes_decrypt
-from shared.key_rotation_manager import KeyRotationManager
+from server.storage.sharded_storage import ShardedStorage
+from server.storage.stripe_assembler import StripeAssembler
 
 # Configure logging
 logging.basicConfig(level=logging.INFO, format='%(asctime)s - %(levelname)s - %(message)s')
 
 SERVER_ADDRESS = ('192.168.233.129', 12345)
 received_directory = "received_files_dkm"
-os.makedirs(received_directory, exist_ok=True)
+FSYNC_BATCH_SIZE = 32  # Files made durable together before their ACKs are sent
+MAX_STRIPED_FILE_SIZE = 16 * 1024 * 1024 * 1024  # Larger striped files are rejected
+storage = None  # ShardedStorage, opened in main()
+stripe_assembler = None  # StripeAssembler over storage, created in main()
+MAX_CONNECTIONS = 8  # Control connection plus the client's stripe connections
 
 server_socket = socket.socket(socket.AF_INET, socket.SOCK_STREAM)
 
 encryption_key = "secure_password"
-key_rotation_manager = KeyRotationManager()
 
 def calculate_checksum(data):
     return hashlib.sha256(data).hexdigest()
 
+def receive_exact(client_socket, length):
+    """Receive exactly `length` bytes from the socket."""
+    data = bytearray()
+    while len(data) < length:
+        chunk = client_socket.recv(min(4096, length - len(data)))
+        if not chunk:
+            raise ConnectionError("Incomplete data received.")
+        data.extend(chunk)
+    return data
+
+def input_pending(client_socket):
+    """Return True if the client has already sent more data."""
+    return bool(select.select([client_socket], [], [], 0)[0])
+
+def acknowledge(client_socket, unacked):
+    """
+    Make the files awaiting an ACK durable, then acknowledge them in order.
+
+    If any of them could not be committed, OSError is raised and nothing is
+    acknowledged.
+    """
+    if unacked:
+        storage.commit(unacked)
+        client_socket.sendall(b"ACK" * len(unacked))
+        unacked.clear()
+
+def encode_png(image):
+    """Encode an RGB(A) or grayscale image array as PNG bytes."""
+    import cv2  # Only needed for progressive transfers
+
+    if image.ndim == 3:
+        if image.shape[2] == 2:
+            image = image[..., 0]  # Drop the alpha channel of gray + alpha
+        elif image.shape[2] >= 3:
+            image = image[..., [2, 1, 0, 3][:image.shape[2]]]  # cv2 expects BGR(A)
+    success, buffer = cv2.imencode('.png', image)
+    if not success:
+        raise ValueError("Failed to encode image as PNG.")
+    return buffer.tobytes()
+
+def receive_progressive_file(client_socket, filename):
+    """
+    Receive an image sent progressively, coarse to fine.
+
+    A PNG preview is written after each band stage so the image can be viewed
+    as soon as the coarsest approximation arrives. The last stage carries the
+    original file, which is stored durably under the name the client sent;
+    the preview is then removed.
+    """
+    from server.decryption.dwt_reconstructor import DWTReconstructor, PROGRESSIVE_STAGES
+
+    reconstructor = DWTReconstructor()
+    preview_name = f"{os.path.splitext(filename)[0]}.preview.png"
+    fragments = {}
+    start_time = time.time()
+    for expected_stage, name in enumerate(PROGRESSIVE_STAGES):
+        stage, length = struct.unpack('>BQ', receive_exact(client_socket, 9))
+        if stage != expected_stage:
+            raise ValueError(f"Unexpected progressive stage {stage}, expected {expected_stage}.")
+        encrypted_data = receive_exact(client_socket, length)
+        payload = pickle.loads(zlib.decompress(aes_decrypt(encrypted_data, encryption_key)))
+        if name not in payload or (stage == 0 and 'meta' not in payload):
+            raise ValueError(f"Progressive stage {stage} is missing its fragments.")
+        fragments.update(payload)
+
+        if name != 'original':
+            preview = reconstructor.preview_image(fragments)
+            storage.save(preview_name, encode_png(preview), durable=False)
+            logging.info("Preview of %s at %dx%d ready after %.3fs.",
+                         filename, preview.shape[1], preview.shape[0], time.time() - start_time)
+
+    save_path = storage.save(filename, fragments['original'])
+    storage.commit([save_path])  # The preview is only removed once the full image is durable and visible
+    storage.delete(preview_name)
+    return save_path
+
 def handle_client_connection(client_socket, client_address):
     global encryption_key  # Ensure the server updates the global encryption key
     logging.info("Connection established with client: %s", client_address)
+    unacked = []  # Saved files whose ACK waits for the next commit
     try:
         while True:
             try:
@@ -34,6 +118,8 @@ def handle_client_connection(client_socket, client_address):
                 if not flag:
                     logging.info("No flag received. Closing connection.")
                     break
+                if flag != b'\x02':
+                    acknowledge(client_socket, unacked)  # Keep ACKs in the order of the requests
 
                 # Handle new key
                 if flag == b'\x01':
@@ -69,31 +155,51 @@ def handle_client_connection(client_socket, client_address):
                         break
 
                     file_data_length = int.from_bytes(file_data_length_bytes, 'big')
-                    file_data = bytearray()
-                    bytes_received = 0
-                    while bytes_received < file_data_length:
-                        chunk = client_socket.recv(min(4096, file_data_length - bytes_received))
-                        if not chunk:
-                            raise ConnectionError("Incomplete data received.")
-                        file_data.extend(chunk)
-                        bytes_received += len(chunk)
+                    file_data = receive_exact(client_socket, file_data_length)
 
                     # Decrypt and deserialize the file
                     decrypted_data = aes_decrypt(file_data, encryption_key)  # Use the updated encryption key
                     data = pickle.loads(decrypted_data)
 
                     # Save the file
-                    save_path = os.path.join(received_directory, filename)
-                    os.makedirs(os.path.dirname(save_path), exist_ok=True)
-                    with open(save_path, 'wb') as f:
-                        f.write(data)
+                    save_path = storage.save(filename, data)
 
-                    logging.info(f"File {filename} saved successfully.")
-                    client_socket.sendall(b"ACK")  # Send acknowledgment to client
+                    logging.info(f"File {filename} saved successfully to {save_path}.")
+                    # Files are only acknowledged once durable. A pipelining client keeps
+                    # sending, so its files are committed together; a client waiting for
+                    # the ACK gets it right away.
+                    unacked.append(save_path)
+                    if len(unacked) >= storage.fsync_batch_size or not input_pending(client_socket):
+                        acknowledge(client_socket, unacked)
+
+                # Handle progressive (DWT band) transfer
+                elif flag == b'\x04':
+                    filename_length = int.from_bytes(receive_exact(client_socket, 4), 'big')
+                    filename = receive_exact(client_socket, filename_length).decode('utf-8', errors='replace')
+                    save_path = receive_progressive_file(client_socket, filename)
+                    logging.info(f"Progressive file {filename} reconstructed to {save_path}.")
+                    client_socket.sendall(b"ACK")
+
+                # Handle a chunk of a file striped across several connections
+                elif flag == b'\x05':
+                    filename_length = int.from_bytes(receive_exact(client_socket, 4), 'big')
+                    filename = receive_exact(client_socket, filename_length).decode('utf-8', errors='replace')
+                    file_size, chunk_size, offset, chunk_length = struct.unpack('>QQQQ', receive_exact(client_socket, 32))
+                    # Check the header before receiving: the sizes come straight from the client
+                    expected_length = stripe_assembler.validate(file_size, chunk_size, offset)
+                    if chunk_length > expected_length + 32:  # IV plus at most one block of padding
+                        raise ValueError(f"Chunk ciphertext of {chunk_length} bytes is too large.")
+                    chunk = aes_decrypt(receive_exact(client_socket, chunk_length), encryption_key)
+                    save_path = stripe_assembler.add_chunk(filename, file_size, chunk_size, offset, chunk)
+                    if save_path:
+                        storage.commit([save_path])  # The last chunk's ACK means the file is durable
+                        logging.info(f"Striped file {filename} reassembled to {save_path}.")
+                    client_socket.sendall(b"ACK")
 
                 # Handle end-of-transfer
                 elif flag == b'\x03':
                     logging.info("End-of-transfer signal received from client.")
+                    storage.commit()  # Make all received files durable before the final ACK
                     client_socket.sendall(b"ACK")  # Acknowledge end-of-transfer
                     logging.info("Acknowledgment for end-of-transfer sent to client.")
                     break  # Exit the loop and close the connection
@@ -109,29 +215,62 @@ def handle_client_connection(client_socket, client_address):
                 logging.error(f"Error handling client data: {e}")
                 break
     finally:
+        try:
+            storage.commit()
+        except Exception as e:
+            logging.error(f"Error committing received files: {e}")
         try:
             client_socket.close()
             logging.info("Client connection closed.")
         except Exception as e:
             logging.error(f"Error closing client socket: {e}")
 
-try:
-    logging.info("Starting server at %s:%d", *SERVER_ADDRESS)
-    server_socket.bind(SERVER_ADDRESS)
-    server_socket.listen(1)
-    logging.info("Server is listening for a connection...")
+def main():
+    global storage, stripe_assembler  # Opened here rather than on import: importing must stay cheap
+    try:
+        storage = ShardedStorage(received_directory, fsync_batch_size=FSYNC_BATCH_SIZE)
+        stripe_assembler = StripeAssembler(storage, MAX_STRIPED_FILE_SIZE)
+        logging.info("Starting server at %s:%d", *SERVER_ADDRESS)
+        server_socket.bind(SERVER_ADDRESS)
+        server_socket.listen(MAX_CONNECTIONS)
+        server_socket.settimeout(1)  # Poll so the loop notices when the control connection ends
+        logging.info("Server is listening for a connection...")
 
-    connection, client_address = server_socket.accept()  # Accept a single connection
-    handle_client_connection(connection, client_address)
+        # The first connection carries the control flow; later ones carry stripes of large files
+        control_done = threading.Event()
+        def handle_control_connection(connection, client_address):
+            try:
+                handle_client_connection(connection, client_address)
+            finally:
+                control_done.set()
 
-except Exception as e:
-    logging.error("Error starting server: %s", e)
-    exit(1)
+        handlers = []
+        while not control_done.is_set():
+            try:
+                connection, client_address = server_socket.accept()
+            except socket.timeout:
+                continue
+            connection.settimeout(None)
+            target = handle_client_connection if handlers else handle_control_connection
+            handler = threading.Thread(target=target, args=(connection, client_address), daemon=True)
+            handler.start()
+            handlers.append(handler)
+
+        for handler in handlers:
+            handler.join()
+        stripe_assembler.close()  # Drop files whose stripes never completed
 
-finally:
-    try:
-        if server_socket:
-            server_socket.close()
-            logging.info("Server socket closed.")
     except Exception as e:
-        logging.error("Error closing server socket: %s", e)
+        logging.error("Error starting server: %s", e)
+        exit(1)
+
+    finally:
+        try:
+            if server_socket:
+                server_socket.close()
+                logging.info("Server socket closed.")
+        except Exception as e:
+            logging.error("Error closing server socket: %s", e)
+
+if __name__ == "__main__":
+    main()
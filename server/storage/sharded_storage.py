@@ -0,0 +1,287 @@
+import os
+import hashlib
+import logging
+import tempfile
+import threading
+import time
+
+
+def _current_umask():
+    """Return the process umask (os.umask can only be read by setting it)."""
+    umask = os.umask(0)
+    os.umask(umask)
+    return umask
+
+
+def check_filename(filename):
+    """
+    Reject filenames that would escape the storage root or clash with temp files.
+
+    Raises:
+        ValueError: If the name is empty, contains a path separator or NUL, or
+            starts with a dot (this covers '.', '..' and hidden temp files).
+    """
+    if not filename or filename.startswith('.') or any(c in filename for c in '/\\\0'):
+        raise ValueError(f"Invalid filename: {filename!r}")
+    return filename
+
+
+class StorageBackend:
+    """
+    Base class for the server's on-disk storage of received files.
+
+    Subclasses decide where a filename lives on disk through `path_for`; the
+    base class takes care of writing each file atomically (temp file in the
+    target directory followed by `os.replace`) and of group-commit fsync.
+    """
+
+    def __init__(self, root, fsync_batch_size=32):
+        """
+        Initialize the storage backend.
+
+        Args:
+            root: Directory under which received files are stored.
+            fsync_batch_size: Number of files written between two fsync
+                barriers. 1 syncs every file before it is acknowledged,
+                0 disables fsync entirely (files are still replaced atomically).
+        """
+        self.root = root
+        self.fsync_batch_size = fsync_batch_size
+        self._known_dirs = set()
+        self._pending = []  # (temp_path, final_path) awaiting the next commit
+        self._failed = set()  # Final paths whose last commit failed
+        self._lock = threading.RLock()  # Files may arrive on several connections at once
+        self._file_mode = 0o666 & ~_current_umask()  # What open(path, 'wb') would have created
+        self._ensure_dir(root)
+        # Walking a store of millions of files takes a while, so stale temp files
+        # are removed in the background; startup does not wait for it
+        self._sweeper = threading.Thread(target=self._sweep_temp_files, args=(time.time(),), daemon=True)
+        self._sweeper.start()
+
+    def _sweep_temp_files(self, started):
+        """
+        Remove temp files left behind by a crash or a failed commit.
+
+        Only temp files last modified before `started` are removed, so files
+        being written by this process are left alone.
+        """
+        removed = 0
+        for directory, _, files in os.walk(self.root):
+            for name in files:
+                if not (name.startswith('.') and name.endswith('.tmp')):
+                    continue
+                path = os.path.join(directory, name)
+                try:
+                    if os.stat(path).st_mtime < started:
+                        os.unlink(path)
+                        removed += 1
+                except FileNotFoundError:
+                    pass
+                except OSError as e:
+                    logging.warning("Could not remove stale temp file %s: %s", path, e)
+        if removed:
+            logging.info("Removed %d stale temp file(s) from %s.", removed, self.root)
+
+    def path_for(self, filename):
+        """
+        Return the final on-disk path for the given filename.
+
+        Implementations must pass the name through `check_filename` first.
+        """
+        raise NotImplementedError
+
+    def _ensure_dir(self, directory):
+        """Create a directory once; later calls are answered from the cache."""
+        if directory in self._known_dirs:
+            return
+        os.makedirs(directory, exist_ok=True)
+        self._known_dirs.add(directory)  # Set.add is atomic, a race only repeats makedirs
+
+    def save(self, filename, data, durable=True):
+        """
+        Write a file atomically.
+
+        The data is written to a hidden temp file next to its final location.
+        Without fsync the temp file is renamed into place right away; with
+        group commit the rename is deferred to `commit` so that a file only
+        appears under its final name once its contents are durable.
+
+        Args:
+            filename: Name of the file as sent by the client.
+            data: File contents (bytes-like).
+            durable: If False, the file is made visible immediately and never
+                fsynced (for transient files such as previews).
+
+        Returns:
+            str: The final path of the file.
+        """
+        fd, temp_path, final_path = self.mkstemp(filename)
+        try:
+            with os.fdopen(fd, 'wb') as f:
+                f.write(data)
+        except Exception:
+            os.unlink(temp_path)
+            raise
+        return self.finish(temp_path, final_path, durable)
+
+    def mkstemp(self, filename):
+        """
+        Create the hidden temp file that will become `filename`.
+
+        The temp file lives in the final directory so that `os.replace` is
+        atomic, and gets the permissions a plain `open(path, 'wb')` would
+        give under the process umask.
+
+        Returns:
+            tuple: (fd, temp_path, final_path); pass the paths to `finish`.
+        """
+        final_path = self.path_for(filename)
+        directory = os.path.dirname(final_path)
+        self._ensure_dir(directory)
+
+        fd, temp_path = tempfile.mkstemp(
+            dir=directory, prefix=f".{os.path.basename(final_path)}.", suffix=".tmp"
+        )
+        try:
+            os.fchmod(fd, self._file_mode)
+        except Exception:
+            os.close(fd)
+            os.unlink(temp_path)
+            raise
+        return fd, temp_path, final_path
+
+    def finish(self, temp_path, final_path, durable=True):
+        """
+        Move a fully written temp file into place, now or at the next commit.
+
+        Returns:
+            str: The final path of the file.
+        """
+        if not durable or not self.fsync_batch_size:
+            os.replace(temp_path, final_path)
+            return final_path
+
+        with self._lock:
+            self._failed.discard(final_path)
+            self._pending.append((temp_path, final_path))
+            if len(self._pending) >= self.fsync_batch_size:
+                self.commit()
+        return final_path
+
+    def delete(self, filename):
+        """Remove a stored file if it exists (for transient files such as previews)."""
+        try:
+            os.unlink(self.path_for(filename))
+        except FileNotFoundError:
+            pass
+
+    def commit(self, paths=()):
+        """
+        Make every pending file durable and visible.
+
+        Each temp file is fsynced, renamed over its final path, and finally
+        every touched directory is fsynced so the renames survive a crash.
+
+        Args:
+            paths: Final paths (as returned by `save`) the caller is about to
+                acknowledge. A batch may be committed by another connection,
+                so failures are remembered per path and checked here.
+
+        Raises:
+            OSError: If a file of this batch or one of `paths` could not be committed.
+        """
+        with self._lock:
+            self._commit()
+            failed = self._failed.intersection(paths)
+        if failed:
+            raise OSError(f"{len(failed)} file(s) could not be committed to {self.root}")
+
+    def _commit(self):
+        if not self._pending:
+            return
+        pending = list(self._pending)
+
+        # A file that cannot be synced or moved is dropped from the batch and its
+        # temp file removed, so a failed commit never leaves orphans behind
+        failed = []
+        synced = []
+        for temp_path, final_path in pending:
+            try:
+                fd = os.open(temp_path, os.O_RDONLY)
+                try:
+                    os.fsync(fd)
+                finally:
+                    os.close(fd)
+                synced.append((temp_path, final_path))
+            except OSError as e:
+                failed.append((temp_path, final_path, e))
+
+        directories = set()
+        for temp_path, final_path in synced:
+            try:
+                os.replace(temp_path, final_path)
+                directories.add(os.path.dirname(final_path))
+            except OSError as e:
+                failed.append((temp_path, final_path, e))
+
+        for temp_path, final_path, e in failed:
+            logging.error("Could not commit %s: %s", final_path, e)
+            self._failed.add(final_path)
+            try:
+                os.unlink(temp_path)
+            except FileNotFoundError:
+                pass
+            except OSError as unlink_error:
+                logging.warning("Could not remove temp file %s: %s", temp_path, unlink_error)
+        del self._pending[:len(pending)]
+
+        for directory in directories:
+            fd = os.open(directory, os.O_RDONLY)
+            try:
+                os.fsync(fd)
+            finally:
+                os.close(fd)
+        logging.info("Committed %d file(s) to %s.", len(pending) - len(failed), self.root)
+        if failed:
+            raise OSError(f"{len(failed)} file(s) could not be committed to {self.root}")
+
+    def close(self):
+        """Commit any files still pending."""
+        self.commit()
+
+
+class FlatStorage(StorageBackend):
+    """Stores every file directly under the root directory."""
+
+    def path_for(self, filename):
+        return os.path.join(self.root, check_filename(filename))
+
+
+class ShardedStorage(StorageBackend):
+    """
+    Stores files under hash-prefix subdirectories of the root directory.
+
+    With the defaults a file lands in `root/ab/cd/filename`, where `abcd...`
+    is the SHA-256 of the filename, so no single directory grows beyond a few
+    thousand entries even with millions of files.
+    """
+
+    def __init__(self, root, fsync_batch_size=32, levels=2, width=2):
+        """
+        Initialize the sharded storage.
+
+        Args:
+            root: Directory under which received files are stored.
+            fsync_batch_size: See `StorageBackend`.
+            levels: Number of nested shard directories.
+            width: Number of hex characters of the hash per shard level.
+        """
+        super().__init__(root, fsync_batch_size)
+        self.levels = levels
+        self.width = width
+
+    def path_for(self, filename):
+        check_filename(filename)
+        digest = hashlib.sha256(filename.encode('utf-8')).hexdigest()
+        shards = [digest[i * self.width:(i + 1) * self.width] for i in range(self.levels)]
+        return os.path.join(self.root, *shards, filename)
@@ -0,0 +1,119 @@
+import os
+import threading
+
+
+class StripeAssembler:
+    """
+    Reassembles files that a client striped across several connections.
+
+    Every chunk covers one slot of a fixed chunk size, so chunks can arrive in
+    any order and from any connection without overlapping. Each chunk is
+    written with `os.pwrite` at its offset into a temp file created by the
+    storage backend; once every slot has arrived the temp file is handed to
+    the backend, which moves it into place (at the next commit with group
+    fsync). Nothing but the chunk being written is held in memory.
+    """
+
+    def __init__(self, storage, max_file_size, max_chunk_size=64 * 1024 * 1024):
+        """
+        Initialize the assembler.
+
+        Args:
+            storage: StorageBackend receiving completed files.
+            max_file_size: Largest striped file accepted, in bytes.
+            max_chunk_size: Largest chunk size accepted, in bytes.
+        """
+        self.storage = storage
+        self.max_file_size = max_file_size
+        self.max_chunk_size = max_chunk_size
+        self._lock = threading.Lock()
+        self._files = {}  # filename -> entry, see _open_entry
+
+    def validate(self, file_size, chunk_size, offset):
+        """
+        Check a chunk header before its payload is received.
+
+        Returns:
+            int: The expected length of the chunk's data.
+
+        Raises:
+            ValueError: If the header is out of bounds or the chunk misaligned.
+        """
+        if not 0 < file_size <= self.max_file_size:
+            raise ValueError(f"Striped file size {file_size} outside 1..{self.max_file_size}.")
+        if not 0 < chunk_size <= self.max_chunk_size:
+            raise ValueError(f"Chunk size {chunk_size} outside 1..{self.max_chunk_size}.")
+        if offset % chunk_size or offset >= file_size:
+            raise ValueError(f"Misaligned chunk offset {offset} for chunk size {chunk_size}.")
+        return min(chunk_size, file_size - offset)
+
+    def _open_entry(self, filename, file_size, chunk_size):
+        fd, temp_path, final_path = self.storage.mkstemp(filename)
+        return {
+            'fd': fd, 'temp_path': temp_path, 'final_path': final_path,
+            'file_size': file_size, 'chunk_size': chunk_size,
+            'chunks': -(-file_size // chunk_size),  # Ceiling division
+            'received': set(), 'writing': set(),
+        }
+
+    def add_chunk(self, filename, file_size, chunk_size, offset, data):
+        """
+        Add one chunk of a striped file.
+
+        While the file is incomplete, a chunk that was already stored (a retry)
+        is ignored.
+
+        Args:
+            filename: Name of the file as sent by the client.
+            file_size: Total size of the file in bytes.
+            chunk_size: Size of every chunk but the last.
+            offset: Offset of the chunk in the file, a multiple of chunk_size.
+            data: Chunk contents.
+
+        Returns:
+            str or None: The saved path once the file is complete, otherwise None.
+        """
+        expected = self.validate(file_size, chunk_size, offset)
+        if len(data) != expected:
+            raise ValueError(f"Chunk at offset {offset} has {len(data)} bytes, expected {expected}.")
+        index = offset // chunk_size
+
+        with self._lock:
+            entry = self._files.get(filename)
+            if entry is not None and (entry['file_size'], entry['chunk_size']) != (file_size, chunk_size):
+                raise ValueError(f"Chunk of {filename} disagrees with earlier chunks on file or chunk size.")
+            if entry is None:
+                entry = self._files[filename] = self._open_entry(filename, file_size, chunk_size)
+            if index in entry['received'] or index in entry['writing']:
+                return None
+            entry['writing'].add(index)
+
+        try:
+            view = memoryview(data)
+            while view:
+                written = os.pwrite(entry['fd'], view, offset)
+                view = view[written:]
+                offset += written
+        finally:
+            with self._lock:
+                entry['writing'].discard(index)
+
+        with self._lock:
+            entry['received'].add(index)
+            if len(entry['received']) < entry['chunks']:
+                return None
+            del self._files[filename]
+
+        os.close(entry['fd'])
+        return self.storage.finish(entry['temp_path'], entry['final_path'])
+
+    def close(self):
+        """Discard incomplete files and their temp files."""
+        with self._lock:
+            entries, self._files = list(self._files.values()), {}
+        for entry in entries:
+            os.close(entry['fd'])
+            try:
+                os.unlink(entry['temp_path'])
+            except FileNotFoundError:
+                pass
@@ -1,13 +1,41 @@
 import hashlib
 import os
+from functools import lru_cache
 
+@lru_cache(maxsize=64)
 def derive_key(password):
-    """Derives a 256-bit key from the given password using SHA-256."""
-    return hashlib.sha256(password.encode()).digest()
+    """
+    Derives a 256-bit key from the given password using SHA-256.
 
-def sha256_hash(data):
-    """Generates a SHA-256 hash of the given data."""
-    return hashlib.sha256(data).digest()
+    Keys are cached per password, so a key epoch only pays for SHA-256 once.
+    """
+    if isinstance(password, str):
+        password = password.encode()
+    return hashlib.sha256(password).digest()
+
+def as_byte_view(data):
+    """Return a flat, zero-copy memoryview of bytes over any buffer (bytes, bytearray, mmap, np.ndarray)."""
+    view = memoryview(data)
+    if view.format != 'B' or view.ndim != 1:
+        view = view.cast('B')
+    return view
+
+def sha256_hash(data, out=None):
+    """
+    Generates a SHA-256 hash of the given data.
+
+    Args:
+        data: Any buffer.
+        out: Optional writable buffer of at least 32 bytes receiving the digest.
+
+    Returns:
+        bytes: The digest, or `out` if it was supplied.
+    """
+    digest = hashlib.sha256(as_byte_view(data)).digest()
+    if out is None:
+        return digest
+    as_byte_view(out)[:len(digest)] = digest
+    return out
 
 def sha512_hash(data):
     """Generates a SHA-512 hash of the given data."""
@@ -17,9 +45,30 @@ def derive_key_from_hash(hash_value):
     """Derive a key from the SHA-256 hash value."""
     return hash_value[:32]  # Use the first 32 bytes for AES-256 key
 
-def xor_data(data1, data2):
-    """Perform XOR operation between two byte arrays."""
-    return bytes(a ^ b for a, b in zip(data1, data2))
+def xor_data(data1, data2, out=None):
+    """
+    Perform XOR operation between two byte arrays.
+
+    The result is as long as the shorter input. Any buffers are accepted and
+    the XOR runs as a single vectorized NumPy operation.
+
+    Args:
+        data1, data2: Buffers to XOR.
+        out: Optional writable buffer receiving the result.
+
+    Returns:
+        bytes: The XOR result, or `out` if it was supplied.
+    """
+    import numpy as np  # Keeps numpy out of the client and server startup path
+
+    a = np.frombuffer(as_byte_view(data1), dtype=np.uint8)
+    b = np.frombuffer(as_byte_view(data2), dtype=np.uint8)
+    length = min(len(a), len(b))
+    if out is None:
+        return np.bitwise_xor(a[:length], b[:length]).tobytes()
+    target = np.frombuffer(as_byte_view(out), dtype=np.uint8)
+    np.bitwise_xor(a[:length], b[:length], out=target[:length])
+    return out
 
 def save_hash_to_file(hash_value, file_path):
     """Save the generated hash to a file."""
@@ -1,18 +1,32 @@
 import os
-import numpy as np
-from skimage import io
-from ID_MSE import compare_images
-from kyber_py.ml_kem import ML_KEM_1024  # Import ML-KEM 1024 for key encapsulation
+import math
+import logging
+from shared.perceptual_hash import SceneIndex
+# skimage, ID_MSE and kyber_py are imported on first use: importing them dominates startup
 
 class KeyRotationManager:
-    def __init__(self, similarity_threshold=0.92):
+    def __init__(self, similarity_threshold=0.92, use_perceptual_hash=True, max_hash_distance=None, history_size=64):
         """
         Initialize the key rotation manager.
         
         Args:
-            similarity_threshold: Threshold below which we trigger key rotation (default: 0.85)
+            similarity_threshold: Threshold below which we trigger key rotation (default: 0.92)
+            use_perceptual_hash: Decide on perceptual hashes of recent scenes instead of
+                a full-resolution MSE against the previous image (default: True)
+            max_hash_distance: Hamming distance up to which two hashes count as the same scene.
+                By default it is derived from similarity_threshold, with the hash similarity
+                defined as 1 - distance / 64 (0.92 allows a distance of 5)
+            history_size: Number of recent scenes remembered by the hash index
         """
         self.similarity_threshold = similarity_threshold
+        self.use_perceptual_hash = use_perceptual_hash
+        self.hash_size = 8  # 8x8 DCT coefficients -> 64-bit hashes
+        if max_hash_distance is None:
+            # distance <= max_hash_distance exactly when 1 - distance / 64 >= similarity_threshold
+            max_hash_distance = math.floor((1 - similarity_threshold) * self.hash_size ** 2 + 1e-9)
+        self.max_hash_distance = max_hash_distance
+        self.scene_index = SceneIndex(history_size)
+        self.key_epoch = 0
         self.last_image_path = None
         self.image_extensions = ['.jpg', '.jpeg', '.png', '.bmp', '.tiff', '.gif']
     
@@ -20,6 +34,42 @@ class KeyRotationManager:
         """Check if a file is an image based on its extension."""
         return any(filename.lower().endswith(ext) for ext in self.image_extensions)
     
+    def _generate_password(self):
+        """Generate a new password using ML-KEM and start a new key epoch."""
+        from kyber_py.ml_kem import ML_KEM_1024  # Import ML-KEM 1024 for key encapsulation
+
+        ek, dk = ML_KEM_1024.keygen()  # Generate keypair (ek, dk)
+        shared_key, ciphertext = ML_KEM_1024.encaps(ek)  # Encapsulate shared key
+        self.key_epoch += 1
+        return shared_key.hex()  # Use the shared key as the new password
+
+    def _should_rotate_by_hash(self, file_path):
+        """
+        Decide on key rotation by looking the image up in the index of recent scenes.
+
+        A scene similar to one seen recently keeps the current key, so a camera
+        alternating between a few views stops rotating once every view is known.
+        """
+        from shared.perceptual_hash import image_hash
+
+        current_hash = image_hash(file_path, self.hash_size)
+        self.last_image_path = file_path
+
+        nearest = self.scene_index.nearest(current_hash)
+        if nearest is None:
+            self.scene_index.add(current_hash, self.key_epoch)
+            return False, None, "First image received, no comparison possible", None
+
+        known_hash, seen_epoch, distance = nearest
+        similarity_score = 1 - distance / self.hash_size ** 2
+        if distance <= self.max_hash_distance:
+            self.scene_index.add(known_hash, self.key_epoch)  # Refresh the matched scene
+            return False, similarity_score, f"Known scene (hash distance {distance} <= {self.max_hash_distance}, seen under key epoch {seen_epoch})", None
+
+        new_password = self._generate_password()
+        self.scene_index.add(current_hash, self.key_epoch)
+        return True, similarity_score, f"New scene detected (hash distance {distance} > {self.max_hash_distance})", new_password
+
     def should_rotate_key(self, file_path):
         """
         Determine if we should rotate keys based on image similarity.
@@ -36,12 +86,21 @@ class KeyRotationManager:
         if not self.is_image_file(filename):
             return False, None, "Not an image file", None
         
+        if self.use_perceptual_hash:
+            try:
+                return self._should_rotate_by_hash(file_path)
+            except Exception as e:
+                logging.warning("Perceptual hash of %s failed, falling back to MSE: %s", file_path, e)
+
         # If no previous image to compare with
         if self.last_image_path is None:
             self.last_image_path = file_path
             return False, None, "First image received, no comparison possible", None
         
         try:
+            from skimage import io
+            from ID_MSE import compare_images
+
             # Load images
             prev_image = io.imread(self.last_image_path)
             current_image = io.imread(file_path)
@@ -54,10 +113,7 @@ class KeyRotationManager:
             
             # Determine if key rotation is needed
             if similarity_score < self.similarity_threshold:
-                # Generate a new password using ML-KEM
-                ek, dk = ML_KEM_1024.keygen()  # Generate keypair (ek, dk)
-                shared_key, ciphertext = ML_KEM_1024.encaps(ek)  # Encapsulate shared key
-                new_password = shared_key.hex()  # Use the shared key as the new password
+                new_password = self._generate_password()
                 return True, similarity_score, f"Low similarity detected ({similarity_score:.4f} < {self.similarity_threshold})", new_password
             else:
                 return False, similarity_score, f"Sufficient similarity ({similarity_score:.4f} >= {self.similarity_threshold})", None
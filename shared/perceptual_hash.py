@@ -0,0 +1,93 @@
+from collections import OrderedDict
+# numpy and skimage are imported inside the hashing functions so that the
+# index can be imported without them
+
+_dct_matrices = {}
+
+def _dct_matrix(n):
+    """Return the orthonormal DCT-II matrix of size n x n (cached)."""
+    import numpy as np
+
+    if n not in _dct_matrices:
+        k = np.arange(n)[:, None]
+        i = np.arange(n)[None, :]
+        matrix = np.sqrt(2.0 / n) * np.cos(np.pi * (2 * i + 1) * k / (2 * n))
+        matrix[0, :] = np.sqrt(1.0 / n)
+        _dct_matrices[n] = matrix
+    return _dct_matrices[n]
+
+def dct_hash(image, hash_size=8, highfreq_factor=4):
+    """
+    Compute a 64-bit (for hash_size=8) DCT perceptual hash of an image.
+
+    Args:
+        image: Image as a numpy array (grayscale or color).
+        hash_size: Side of the low-frequency DCT block kept in the hash.
+        highfreq_factor: The image is downscaled to hash_size * highfreq_factor.
+
+    Returns:
+        int: The hash, one bit per kept DCT coefficient.
+    """
+    import numpy as np
+    from skimage.transform import resize
+
+    image = np.asarray(image, dtype=np.float64)
+    if image.ndim == 3:
+        image = image[..., :3].mean(axis=2)
+    size = hash_size * highfreq_factor
+    small = resize(image, (size, size), anti_aliasing=True)
+    matrix = _dct_matrix(size)
+    dct = matrix @ small @ matrix.T
+    low = dct[:hash_size, :hash_size].ravel()
+    bits = low > np.median(low[1:])  # Skip the DC term when choosing the threshold
+    return int.from_bytes(np.packbits(bits).tobytes(), 'big')
+
+def image_hash(file_path, hash_size=8):
+    """Load an image from disk and return its DCT perceptual hash."""
+    from skimage import io
+
+    return dct_hash(io.imread(file_path, as_gray=True), hash_size)
+
+def hamming_distance(hash1, hash2):
+    """Return the number of differing bits between two hashes."""
+    return bin(hash1 ^ hash2).count('1')
+
+class SceneIndex:
+    """Bounded, least-recently-used index of perceptual hashes of recent scenes."""
+
+    def __init__(self, capacity=64):
+        """
+        Initialize the scene index.
+
+        Args:
+            capacity: Maximum number of scenes remembered.
+        """
+        self.capacity = capacity
+        self._entries = OrderedDict()  # hash -> label
+
+    def __len__(self):
+        return len(self._entries)
+
+    def add(self, image_hash, label=None):
+        """Remember a scene, evicting the least recently seen one if full."""
+        self._entries[image_hash] = label
+        self._entries.move_to_end(image_hash)
+        while len(self._entries) > self.capacity:
+            self._entries.popitem(last=False)
+
+    def nearest(self, image_hash):
+        """
+        Find the closest remembered scene.
+
+        Returns:
+            tuple: (hash, label, distance) of the nearest entry, or None if empty.
+        """
+        best = None
+        for known_hash, label in self._entries.items():
+            distance = hamming_distance(image_hash, known_hash)
+            if best is None or distance < best[2]:
+                best = (known_hash, label, distance)
+        return best
+
+    def clear(self):
+        self._entries.clear()